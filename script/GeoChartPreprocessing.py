@@ -1,13 +1,31 @@
+import argparse
+import json
+
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
-def process_food_incidents():
+import incident_sources
+from binary_bundle import write_with_bundle
+from incident_sources import SOURCES, read_source
+from municipality_join import (MAP_BOUNDARIES, NO_MUNICIPALITY, load_municipalities, municipality_counts,
+                               tag_municipalities)
+from stage_store import cached_frame
+
+
+def process_food_incidents(engine='c'):
     """Process food systems incidents dataset"""
     print("Processing food systems incidents...")
     
-    # Read the dataset
-    df = pd.read_csv('src/Dataset/2023-2025-pse-gaza-conflict-incidents-affecting-food-systems-incident-data-incident-data.csv')
+    inputs = [SOURCES['food']['path'], incident_sources.__file__]
+    processed = cached_frame('Food_Incidents_Processed', inputs, lambda: _build_food_incidents(engine),
+                             params={'engine': engine})
+    print(f"Processed {len(processed)} food system incidents")
+    return processed
+
+def _build_food_incidents(engine):
+    # Read the used columns of the dataset with their schema
+    df = read_source('food', engine=engine)
     
     # Select relevant columns
     processed = pd.DataFrame({
@@ -39,58 +57,81 @@ def process_food_incidents():
     # Format date as string for export
     processed['date_string'] = processed['date'].dt.strftime('%Y-%m-%d')
     
-    print(f"Processed {len(processed)} food system incidents")
     return processed
 
-def process_health_incidents():
+def _count_text(column, suffix):
+    """Format an integer count column as "<n> <suffix>" strings."""
+    return column.astype('int64').astype(str).to_numpy(dtype=object) + suffix
+
+def _append_clause(text, mask, clause, sep):
+    """Append clause[mask] to text[mask], with sep after any existing text."""
+    current = text[mask]
+    text[mask] = np.where(current != '', current + sep, current) + clause[mask]
+
+def create_health_descriptions(df):
+    """Build the description text of every health care incident.
+
+    Each clause is a string column that only applies where its mask is set,
+    and clauses are appended in order with vectorized string ops. The text is
+    identical to formatting each row on its own.
+    """
+    n = len(df)
+    text = np.full(n, '', dtype=object)
+
+    def constant(value):
+        return np.full(n, value, dtype=object)
+
+    def count_clause(column, suffix):
+        mask = (df[column] > 0).to_numpy()
+        clause = np.full(n, '', dtype=object)
+        clause[mask] = _count_text(df[column][mask], suffix)
+        return mask, clause
+
+    # Facilities
+    _append_clause(text, *count_clause('Number of Attacks on Health Facilities Reporting Destruction', ' facility(ies) destroyed'), '; ')
+    _append_clause(text, *count_clause('Number of Attacks on Health Facilities Reporting Damaged', ' facility(ies) damaged'), '; ')
+
+    # Health workers
+    casualties = np.full(n, '', dtype=object)
+    for column, suffix in [('Health Workers Killed', ' killed'),
+                           ('Health Workers Injured', ' injured'),
+                           ('Health Workers Kidnapped', ' kidnapped'),
+                           ('Health Workers Arrested', ' arrested')]:
+        _append_clause(casualties, *count_clause(column, suffix), ', ')
+    has_casualties = casualties != ''
+    profession = df['Reported Health Worker Profession']
+    profession = np.where(profession.notna().to_numpy(),
+                          profession.astype(str).to_numpy(dtype=object), 'health workers')
+    _append_clause(text, has_casualties, profession + ': ' + casualties, '; ')
+
+    # Other impacts
+    _append_clause(text, (df['Forceful Entry into Health Facility'] > 0).to_numpy(), constant("forceful entry"), '; ')
+    _append_clause(text, (df['Occupation of Health Facility'] > 0).to_numpy(), constant("facility occupation"), '; ')
+    _append_clause(text, (df['Vicinity of Health Facility Affected'] > 0).to_numpy(), constant("vicinity affected"), '; ')
+    # Truthiness, as in `if value:` (missing values count as true)
+    _append_clause(text, df['Access Denied or Obstructed'].to_numpy(dtype=object).astype(bool), constant("access obstructed"), '; ')
+
+    # Transportation
+    _append_clause(text, *count_clause('Health Transportation Destroyed', ' ambulance(s) destroyed'), '; ')
+    _append_clause(text, *count_clause('Health Transportation Damaged', ' ambulance(s) damaged'), '; ')
+
+    text[text == ''] = "Health facility incident"
+    return pd.Series(text, index=df.index)
+
+def process_health_incidents(engine='c'):
     """Process health care incidents dataset"""
     print("Processing health care incidents...")
     
-    # Read the dataset (skip the second header row with # symbols)
-    df = pd.read_csv('src/Dataset/2023-2024-pse-shcc-health-care-data.csv', skiprows=[1])
-    
-    # Create a description based on available data
-    def create_health_description(row):
-        parts = []
-        
-        # Facilities
-        if row['Number of Attacks on Health Facilities Reporting Destruction'] > 0:
-            parts.append(f"{int(row['Number of Attacks on Health Facilities Reporting Destruction'])} facility(ies) destroyed")
-        if row['Number of Attacks on Health Facilities Reporting Damaged'] > 0:
-            parts.append(f"{int(row['Number of Attacks on Health Facilities Reporting Damaged'])} facility(ies) damaged")
-        
-        # Health workers
-        casualties = []
-        if row['Health Workers Killed'] > 0:
-            casualties.append(f"{int(row['Health Workers Killed'])} killed")
-        if row['Health Workers Injured'] > 0:
-            casualties.append(f"{int(row['Health Workers Injured'])} injured")
-        if row['Health Workers Kidnapped'] > 0:
-            casualties.append(f"{int(row['Health Workers Kidnapped'])} kidnapped")
-        if row['Health Workers Arrested'] > 0:
-            casualties.append(f"{int(row['Health Workers Arrested'])} arrested")
-        
-        if casualties:
-            profession = row['Reported Health Worker Profession'] if pd.notna(row['Reported Health Worker Profession']) else "health workers"
-            parts.append(f"{profession}: {', '.join(casualties)}")
-        
-        # Other impacts
-        if row['Forceful Entry into Health Facility'] > 0:
-            parts.append("forceful entry")
-        if row['Occupation of Health Facility'] > 0:
-            parts.append("facility occupation")
-        if row['Vicinity of Health Facility Affected'] > 0:
-            parts.append("vicinity affected")
-        if row['Access Denied or Obstructed']:
-            parts.append("access obstructed")
-        
-        # Transportation
-        if row['Health Transportation Destroyed'] > 0:
-            parts.append(f"{int(row['Health Transportation Destroyed'])} ambulance(s) destroyed")
-        if row['Health Transportation Damaged'] > 0:
-            parts.append(f"{int(row['Health Transportation Damaged'])} ambulance(s) damaged")
-        
-        return "; ".join(parts) if parts else "Health facility incident"
+    inputs = [SOURCES['health']['path'], incident_sources.__file__]
+    processed = cached_frame('Health_Incidents_Processed', inputs, lambda: _build_health_incidents(engine),
+                             params={'engine': engine})
+    print(f"Processed {len(processed)} health care incidents")
+    return processed
+
+def _build_health_incidents(engine):
+    # Read the used columns of the dataset with their schema (the second
+    # header row with # symbols is skipped)
+    df = read_source('health', engine=engine)
     
     # Select relevant columns
     processed = pd.DataFrame({
@@ -98,7 +139,7 @@ def process_health_incidents():
         'latitude': df['Latitude'],
         'longitude': df['Longitude'],
         'type': 'Health Care',
-        'description': df.apply(create_health_description, axis=1),
+        'description': create_health_descriptions(df),
         'perpetrator': df['Reported Perpetrator Name'],
         'perpetrator_type': df['Reported Perpetrator'],
         'weapon': df['Weapon Carried/Used'],
@@ -127,7 +168,6 @@ def process_health_incidents():
     # Format date as string for export
     processed['date_string'] = processed['date'].dt.strftime('%Y-%m-%d')
     
-    print(f"Processed {len(processed)} health care incidents")
     return processed
 
 def create_combined_dataset(food_df, health_df):
@@ -159,6 +199,147 @@ def create_combined_dataset(food_df, health_df):
     
     return combined
 
+def create_time_index(combined_df):
+    """Month offsets, per-type row tables and cumulative counts for the map slider.
+
+    Rows are positions in the combined dataset, which is sorted by date
+    (row i has id i + 1). The incidents of month k are rows
+    offsets[k]:offsets[k + 1]; cumulative mode up to month k is rows
+    0:offsets[k + 1]. Each type has the same tables over its own rows.
+    """
+    periods = combined_df['date'].dt.to_period('M')
+    first, last = periods.min(), periods.max()
+    months = pd.period_range(first, last, freq='M')
+    month_idx = ((combined_df['date'].dt.year - first.year) * 12
+                 + combined_df['date'].dt.month - first.month).to_numpy()
+    bounds = np.arange(len(months) + 1)
+
+    offsets = np.searchsorted(month_idx, bounds)
+    index = {
+        'months': [str(m) for m in months],
+        'count': len(combined_df),
+        'offsets': offsets.tolist(),
+        'counts': np.diff(offsets).tolist(),
+        'cumulative': offsets[1:].tolist(),
+        'types': {},
+    }
+    types = combined_df['type'].to_numpy()
+    for t in sorted(combined_df['type'].unique()):
+        rows = np.flatnonzero(types == t)
+        type_offsets = np.searchsorted(month_idx[rows], bounds)
+        index['types'][t] = {
+            'rows': rows.tolist(),
+            'offsets': type_offsets.tolist(),
+            'counts': np.diff(type_offsets).tolist(),
+            'cumulative': type_offsets[1:].tolist(),
+        }
+    return index
+
+def _lines(coords):
+    """Point sequences (rings, lines, single points) of GeoJSON coordinates."""
+    if isinstance(coords[0], (int, float)):
+        yield [coords]
+    elif isinstance(coords[0][0], (int, float)):
+        yield coords
+    else:
+        for part in coords:
+            yield from _lines(part)
+
+def _cartesian(lon, lat):
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+def geo_bounds(path=MAP_BOUNDARIES):
+    """Spherical lon/lat bounds of a GeoJSON FeatureCollection, as d3.geoBounds computes them.
+
+    Edges are great-circle arcs, so between two vertices an edge can reach a
+    latitude beyond both of them; like d3, the arc's extreme point counts when
+    it lies within the edge's longitude span. Regions crossing the
+    antimeridian or containing a pole (which d3 also handles) do not occur
+    in the Gaza boundaries and are not handled here.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+    lon_min = lat_min = np.inf
+    lon_max = lat_max = -np.inf
+    for feature in geojson['features']:
+        for line in _lines(feature['geometry']['coordinates']):
+            lonlat = np.array([point[:2] for point in line], dtype=np.float64)
+            lon_min, lat_min = np.minimum((lon_min, lat_min), lonlat.min(axis=0))
+            lon_max, lat_max = np.maximum((lon_max, lat_max), lonlat.max(axis=0))
+            if len(lonlat) < 2:
+                continue
+            # Point of the edge's great circle furthest from the equator (d3 linePoint)
+            xyz = _cartesian(*np.radians(lonlat).T)
+            normal = np.cross(xyz[:-1], xyz[1:])
+            equatorial = np.column_stack((normal[:, 1], -normal[:, 0], np.zeros(len(normal))))
+            inflection = np.cross(equatorial, normal)
+            norm = np.linalg.norm(inflection, axis=1)
+            edge = norm > 0  # repeated vertices (e.g. closing points) have no arc
+            inflection = inflection[edge] / norm[edge, None]
+            lam_i = np.degrees(np.arctan2(inflection[:, 1], inflection[:, 0]))
+            phi_i = np.degrees(np.arcsin(np.clip(inflection[:, 2], -1, 1)))
+            lam0, lam1 = lonlat[:-1, 0][edge], lonlat[1:, 0][edge]
+            sign = np.where(lam1 - lam0 > 0, 1.0, -1.0)
+            north = (sign * lam0 < sign * lam_i) & (sign * lam_i < sign * lam1)
+            lam_s = (sign * lam_i + 360) % 360 - 180
+            south = ~north & (sign * lam0 < lam_s) & (lam_s < sign * lam1)
+            if north.any():
+                lat_max = max(lat_max, phi_i[north].max())
+            if south.any():
+                lat_min = min(lat_min, -phi_i[south].max())
+    return (float(lon_min), float(lat_min)), (float(lon_max), float(lat_max))
+
+def boundaries_center(path=MAP_BOUNDARIES):
+    """Center of the spherical bounding box of a GeoJSON FeatureCollection.
+
+    Matches the center GeoMap computes from d3.geoBounds of the same file.
+    """
+    (lon_min, lat_min), (lon_max, lat_max) = geo_bounds(path)
+    return (lon_min + lon_max) / 2, (lat_min + lat_max) / 2
+
+def project_incidents(combined_df, center):
+    """Mercator coordinates of the incidents relative to the map center, as Int16.
+
+    The GeoMap projection is d3.geoMercator().center(center).scale(k)
+    .translate([tx, ty]), which maps a point to
+      x = tx + k * (lambda - lambda0)
+      y = ty - k * (ln tan(pi/4 + phi/2) - ln tan(pi/4 + phi0/2))
+    with angles in radians. The unit-scale terms are quantized to Int16 over
+    the extent of the points, so the browser only computes
+      x = tx + k * (qx * step[0] + offset[0])
+      y = ty + k * (qy * step[1] + offset[1]).
+    """
+    lon0, lat0 = np.radians(center[0]), np.radians(center[1])
+    lam = np.radians(combined_df['longitude'].to_numpy(dtype=np.float64))
+    phi = np.radians(combined_df['latitude'].to_numpy(dtype=np.float64))
+    ux = lam - lon0
+    uy = -(np.log(np.tan(np.pi / 4 + phi / 2)) - np.log(np.tan(np.pi / 4 + lat0 / 2)))
+
+    params = {'projection': 'mercator', 'center': [float(center[0]), float(center[1])],
+              'count': len(combined_df), 'dtype': 'int16', 'byteOrder': 'little',
+              'byteOffsets': {'x': 0, 'y': 2 * len(combined_df)}, 'step': [], 'offset': []}
+    quantized = []
+    for values in (ux, uy):
+        lo, hi = (float(values.min()), float(values.max())) if len(values) else (0.0, 0.0)
+        step = (hi - lo) / 65535 or 1.0
+        # Int16 range -32768..32767 covers lo..hi
+        q = np.round((values - lo) / step) - 32768
+        quantized.append(q.astype('<i2'))
+        params['step'].append(step)
+        params['offset'].append(lo + 32768 * step)
+    return quantized[0], quantized[1], params
+
+def save_projected_incidents(combined_df, prefix, boundaries=MAP_BOUNDARIES):
+    """Write <prefix>.bin (Int16 x block, then y block) and <prefix>.json (parameters)."""
+    qx, qy, params = project_incidents(combined_df, boundaries_center(boundaries))
+    params['boundaries'] = boundaries
+    with open(f'{prefix}.bin', 'wb') as f:
+        f.write(qx.tobytes())
+        f.write(qy.tobytes())
+    with open(f'{prefix}.json', 'w', encoding='utf-8') as f:
+        json.dump(params, f, indent=2)
+    return params
+
 def generate_summary_statistics(food_df, health_df, combined_df):
     """Generate summary statistics"""
     print("\n" + "="*60)
@@ -169,9 +350,9 @@ def generate_summary_statistics(food_df, health_df, combined_df):
     print(f"  Total incidents: {len(food_df)}")
     print(f"  Date range: {food_df['date'].min().strftime('%Y-%m-%d')} to {food_df['date'].max().strftime('%Y-%m-%d')}")
     print(f"  Main perpetrators:")
-    print(food_df['perpetrator'].value_counts().head(3).to_string())
+    print(food_df['perpetrator'].astype(object).value_counts().head(3).to_string())
     print(f"\n  Most common weapons:")
-    print(food_df['weapon'].value_counts().head(3).to_string())
+    print(food_df['weapon'].astype(object).value_counts().head(3).to_string())
     
     print("\n" + "-"*60)
     print("\nHealth Care Incidents:")
@@ -182,7 +363,7 @@ def generate_summary_statistics(food_df, health_df, combined_df):
     print(f"  Total facilities destroyed: {int(health_df['facilities_destroyed'].sum())}")
     print(f"  Total facilities damaged: {int(health_df['facilities_damaged'].sum())}")
     print(f"  Main perpetrators:")
-    print(health_df['perpetrator'].value_counts().head(3).to_string())
+    print(health_df['perpetrator'].astype(object).value_counts().head(3).to_string())
     
     print("\n" + "-"*60)
     print("\nCombined Dataset:")
@@ -194,18 +375,31 @@ def generate_summary_statistics(food_df, health_df, combined_df):
     print(combined_df['type'].value_counts().to_string())
     print("="*60 + "\n")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Preprocess the incident datasets for the GeoChart.")
+    parser.add_argument('--engine', choices=['c', 'pyarrow'], default='c',
+                        help="CSV parser used to read the incident exports (default: c)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("\n" + "="*60)
     print("GEOCHART DATA PREPROCESSING")
     print("="*60 + "\n")
     
     # Process both datasets
-    food_df = process_food_incidents()
-    health_df = process_health_incidents()
+    food_df = process_food_incidents(args.engine)
+    health_df = process_health_incidents(args.engine)
     
     # Create combined dataset
     combined_df = create_combined_dataset(food_df, health_df)
     
+    # Tag every incident with the municipality it falls in
+    municipalities = load_municipalities(MAP_BOUNDARIES)
+    combined_df['municipality_id'] = tag_municipalities(combined_df, municipalities)
+    matched = int((combined_df['municipality_id'] != NO_MUNICIPALITY).sum())
+    print(f"Municipality join: {matched} of {len(combined_df)} incidents inside the Gaza municipalities\n")
+    
     # Generate statistics
     generate_summary_statistics(food_df, health_df, combined_df)
     
@@ -213,14 +407,22 @@ def main():
     output_dir = 'src/Dataset/processed/'
     
     print("Saving processed datasets...")
-    food_df.to_csv(f'{output_dir}Food_Incidents_Processed.csv', index=False)
-    print(f"  ✓ Saved: {output_dir}Food_Incidents_Processed.csv")
-    
-    health_df.to_csv(f'{output_dir}Health_Incidents_Processed.csv', index=False)
-    print(f"  ✓ Saved: {output_dir}Health_Incidents_Processed.csv")
-    
-    combined_df.to_csv(f'{output_dir}Combined_Incidents_GeoChart.csv', index=False)
-    print(f"  ✓ Saved: {output_dir}Combined_Incidents_GeoChart.csv")
+    write_with_bundle(combined_df, f'{output_dir}Combined_Incidents_GeoChart.csv')
+    print(f"  ✓ Saved: {output_dir}Combined_Incidents_GeoChart.csv/.bin")
+    
+    counts = municipality_counts(combined_df, municipalities)
+    write_with_bundle(counts, f'{output_dir}Combined_Incidents_Municipalities.csv')
+    print(f"  ✓ Saved: {output_dir}Combined_Incidents_Municipalities.csv/.bin "
+          f"({counts['municipality_id'].nunique()} municipalities)")
+    
+    time_index = create_time_index(combined_df)
+    with open(f'{output_dir}Combined_Incidents_TimeIndex.json', 'w', encoding='utf-8') as f:
+        json.dump(time_index, f, separators=(',', ':'))
+    print(f"  ✓ Saved: {output_dir}Combined_Incidents_TimeIndex.json ({len(time_index['months'])} months)")
+    
+    params = save_projected_incidents(combined_df, f'{output_dir}Combined_Incidents_Projected')
+    print(f"  ✓ Saved: {output_dir}Combined_Incidents_Projected.bin/.json "
+          f"({params['count']} points, Int16)")
     
     print("\n✓ Processing complete!\n")
 
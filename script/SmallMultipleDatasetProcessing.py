@@ -1,9 +1,14 @@
 import pandas as pd
 import os
+from pathlib import Path
+
+from binary_bundle import write_with_bundle
+from stage_store import cached_frame
 
 # Define paths
-dataset_dir = r'C:\Users\mfmat\Documents\Magistrale\SecondoAnno\DV\Data-Visualization-Project\src\Dataset'
-output_dir = r'C:\Users\mfmat\Documents\Magistrale\SecondoAnno\DV\Data-Visualization-Project\src\Dataset\processed'
+PROJECT_ROOT = Path(__file__).parent.parent
+dataset_dir = str(PROJECT_ROOT / 'src' / 'Dataset')
+output_dir = str(PROJECT_ROOT / 'src' / 'Dataset' / 'processed')
 
 # Create output directory if it doesn't exist
 os.makedirs(output_dir, exist_ok=True)
@@ -15,7 +20,13 @@ start_year = 2018
 
 def process_gdp():
     """Process GDP dataset"""
-    df = pd.read_csv(os.path.join(dataset_dir, 'GDP.csv'))
+    path = os.path.join(dataset_dir, 'GDP.csv')
+    df_long = cached_frame('GDP_processed', [path], lambda: _build_gdp(path))
+    print(f"GDP processed: {len(df_long)} rows")
+    return df_long
+
+def _build_gdp(path):
+    df = pd.read_csv(path)
     
     # Filter for Israel and Palestine
     df_filtered = df[df['REF_AREA_LABEL'].isin(COUNTRIES)]
@@ -48,13 +59,17 @@ def process_gdp():
     # Filter by start_year
     df_long = df_long[df_long['Year'] >= start_year]
     
-    df_long.to_csv(os.path.join(output_dir, 'GDP_processed.csv'), index=False)
-    print(f"GDP processed: {len(df_long)} rows")
     return df_long
 
 def process_drinking_water():
     """Process Safely Drinking Services dataset"""
-    df = pd.read_csv(os.path.join(dataset_dir, 'SafelyDrinkingServices.csv'))
+    path = os.path.join(dataset_dir, 'SafelyDrinkingServices.csv')
+    df_long = cached_frame('DrinkingWater_processed', [path], lambda: _build_drinking_water(path))
+    print(f"Drinking Water processed: {len(df_long)} rows")
+    return df_long
+
+def _build_drinking_water(path):
+    df = pd.read_csv(path)
     
     # Filter for Israel and Palestine
     df_filtered = df[df['REF_AREA_LABEL'].isin(COUNTRIES)]
@@ -90,13 +105,17 @@ def process_drinking_water():
     # Round percentage to 1 decimal place
     df_long['Drinking_Water_Access_Percent'] = df_long['Drinking_Water_Access_Percent'].round(1)
     
-    df_long.to_csv(os.path.join(output_dir, 'DrinkingWater_processed.csv'), index=False)
-    print(f"Drinking Water processed: {len(df_long)} rows")
     return df_long
 
 def process_sanitation():
     """Process Safely Sanitation Services dataset"""
-    df = pd.read_csv(os.path.join(dataset_dir, 'SafelySanitationServices.csv'))
+    path = os.path.join(dataset_dir, 'SafelySanitationServices.csv')
+    df_long = cached_frame('Sanitation_processed', [path], lambda: _build_sanitation(path))
+    print(f"Sanitation processed: {len(df_long)} rows")
+    return df_long
+
+def _build_sanitation(path):
+    df = pd.read_csv(path)
     
     # Filter for Israel and Palestine
     df_filtered = df[df['REF_AREA_LABEL'].isin(COUNTRIES)]
@@ -132,13 +151,17 @@ def process_sanitation():
     # Round percentage to 1 decimal place
     df_long['Sanitation_Access_Percent'] = df_long['Sanitation_Access_Percent'].round(1)
     
-    df_long.to_csv(os.path.join(output_dir, 'Sanitation_processed.csv'), index=False)
-    print(f"Sanitation processed: {len(df_long)} rows")
     return df_long
 
 def process_food_insecurity():
     """Process Food Insecurity dataset"""
-    df = pd.read_csv(os.path.join(dataset_dir, 'FoodInsecurity.csv'))
+    path = os.path.join(dataset_dir, 'FoodInsecurity.csv')
+    df_long = cached_frame('FoodInsecurity_processed', [path], lambda: _build_food_insecurity(path))
+    print(f"Food Insecurity processed: {len(df_long)} rows")
+    return df_long
+
+def _build_food_insecurity(path):
+    df = pd.read_csv(path)
     
     # Filter for Israel and Palestine
     df_filtered = df[df['REF_AREA_LABEL'].isin(COUNTRIES)]
@@ -181,18 +204,10 @@ def process_food_insecurity():
     # Round percentage to 1 decimal place
     df_long['Food_Insecurity_Percent'] = df_long['Food_Insecurity_Percent'].round(1)
     
-    df_long.to_csv(os.path.join(output_dir, 'FoodInsecurity_processed.csv'), index=False)
-    print(f"Food Insecurity processed: {len(df_long)} rows")
     return df_long
 
-def create_combined_dataset():
+def create_combined_dataset(gdp, drinking, sanitation, food):
     """Combine all datasets into one for small multiple chart"""
-    # Load all processed datasets
-    gdp = pd.read_csv(os.path.join(output_dir, 'GDP_processed.csv'))
-    drinking = pd.read_csv(os.path.join(output_dir, 'DrinkingWater_processed.csv'))
-    sanitation = pd.read_csv(os.path.join(output_dir, 'Sanitation_processed.csv'))
-    food = pd.read_csv(os.path.join(output_dir, 'FoodInsecurity_processed.csv'))
-    
     # Merge all datasets
     combined = gdp.merge(drinking, on=['Country', 'Year'], how='outer')
     combined = combined.merge(sanitation, on=['Country', 'Year'], how='outer')
@@ -201,7 +216,7 @@ def create_combined_dataset():
     # Sort by Country and Year
     combined = combined.sort_values(['Country', 'Year'])
     
-    combined.to_csv(os.path.join(output_dir, 'Combined_SmallMultiple.csv'), index=False)
+    write_with_bundle(combined, os.path.join(output_dir, 'Combined_SmallMultiple.csv'))
     print(f"\nCombined dataset created: {len(combined)} rows")
     print(f"Countries: {combined['Country'].unique()}")
     print(f"Year range: {combined['Year'].min()} - {combined['Year'].max()}")
@@ -221,16 +236,12 @@ if __name__ == "__main__":
     
     print("\n" + "=" * 60)
     print("Creating combined dataset...")
-    combined_df = create_combined_dataset()
+    combined_df = create_combined_dataset(gdp_df, drinking_df, sanitation_df, food_df)
     
     print("\n" + "=" * 60)
     print("Processing complete!")
     print(f"Output directory: {output_dir}")
     print("\nGenerated files:")
-    print("  - GDP_processed.csv")
-    print("  - DrinkingWater_processed.csv")
-    print("  - Sanitation_processed.csv")
-    print("  - FoodInsecurity_processed.csv")
     print("  - Combined_SmallMultiple.csv")
     
     # Display sample of combined data
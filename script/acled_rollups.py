@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Single-pass rollups over the ACLED aggregated export.
+
+The export is read in fixed-size chunks with only the columns the rollups
+need. The country / ADMIN1 filter runs on each raw chunk before anything
+else is parsed, and WEEK is converted for the surviving rows only. Every
+rollup keeps a partial aggregate that each chunk is folded into, so all
+rollups come out of one scan and memory depends on the number of groups,
+not on the size of the export.
+
+Rollups are declared in ROLLUPS; more can be added from a JSON file with
+the same structure:
+
+  {"fatalities_per_year": {"by": ["YEAR", "COUNTRY"], "value": "FATALITIES",
+                           "agg": "sum", "rename": {"COUNTRY": "country"}}}
+
+"by" may use any export column plus the derived keys MONTH and YEAR;
+"agg" is one of sum, count, min, max.
+
+Usage:
+  python script/acled_rollups.py --input src/Dataset/Middle-East_aggregated_data_up_to-2025-12-06.csv
+  python script/acled_rollups.py --input <export.csv> --rollups extra_rollups.json --only fatalities_per_year
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATASET_DIR = PROJECT_ROOT / 'src' / 'Dataset'
+INPUT_PATH = DATASET_DIR / 'Middle-East_aggregated_data_up_to-2025-12-06.csv'
+
+CHUNK_ROWS = 200000
+SAMPLE_ROWS = 10000
+# Peak memory of a chunk relative to its parsed size (read buffers, filtered
+# copy, group keys), plus a fixed cost of the chunked reader itself
+CHUNK_OVERHEAD = 3.5
+READER_OVERHEAD_MB = 64
+CUTOFF = '2023-01-01'
+
+# Country -> ADMIN1 regions to keep (None keeps the whole country)
+REGIONS = {'Israel': None, 'Palestine': ['Gaza Strip']}
+COUNTRY_NAMES = {'Palestine': 'Gaza'}
+
+ROLLUPS = {
+    'fatalities_per_month': {
+        'by': ['MONTH', 'COUNTRY', 'EVENT_TYPE'],
+        'value': 'FATALITIES',
+        'agg': 'sum',
+        'rename': {'COUNTRY': 'country', 'FATALITIES': 'fatalities', 'EVENT_TYPE': 'event_type'},
+    },
+    'events_per_week': {
+        'by': ['WEEK', 'COUNTRY', 'EVENT_TYPE'],
+        'value': 'EVENTS',
+        'agg': 'sum',
+        'rename': {'COUNTRY': 'country', 'EVENTS': 'events', 'EVENT_TYPE': 'event_type'},
+    },
+    'events_sankey': {
+        'by': ['COUNTRY', 'EVENT_TYPE', 'SUB_EVENT_TYPE'],
+        'value': 'EVENTS',
+        'agg': 'sum',
+        'rename': {'COUNTRY': 'country', 'EVENT_TYPE': 'event_type',
+                   'SUB_EVENT_TYPE': 'sub_event_type', 'EVENTS': 'events'},
+    },
+}
+
+DERIVED = {
+    'MONTH': lambda chunk: chunk['WEEK'].dt.to_period('M'),
+    'YEAR': lambda chunk: chunk['WEEK'].dt.year,
+}
+
+# How partial results of each aggregation combine
+MERGE_AGG = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def load_rollups(path):
+    """Read extra rollup declarations from a JSON file and validate them."""
+    with open(path, 'r', encoding='utf-8') as f:
+        rollups = json.load(f)
+    for name, spec in rollups.items():
+        missing = {'by', 'value'} - set(spec)
+        if missing:
+            raise ValueError(f"Rollup '{name}' in {path} lacks {', '.join(sorted(missing))}")
+        if spec.get('agg', 'sum') not in MERGE_AGG:
+            raise ValueError(f"Rollup '{name}' in {path}: unsupported agg '{spec['agg']}'")
+    return rollups
+
+
+def needed_columns(rollups):
+    """Export columns read for the filter and the given rollups."""
+    columns = {'WEEK', 'COUNTRY', 'ADMIN1'}
+    for spec in rollups.values():
+        columns.update(col for col in spec['by'] if col not in DERIVED)
+        columns.add(spec['value'])
+    return sorted(columns)
+
+
+def filter_chunk(chunk, regions=REGIONS, since=CUTOFF):
+    """Keep the selected regions from `since` on; WEEK is parsed after the region filter."""
+    mask = pd.Series(False, index=chunk.index)
+    for country, admin1 in regions.items():
+        in_country = chunk['COUNTRY'] == country
+        if admin1 is not None:
+            in_country &= chunk['ADMIN1'].isin(admin1)
+        mask |= in_country
+    chunk = chunk[mask].copy()
+    chunk['COUNTRY'] = chunk['COUNTRY'].replace(COUNTRY_NAMES)
+    chunk['WEEK'] = pd.to_datetime(chunk['WEEK'])
+    return chunk[chunk['WEEK'] >= pd.to_datetime(since)].copy()
+
+
+def iter_chunks(path, columns, chunk_rows=CHUNK_ROWS, regions=REGIONS, since=CUTOFF):
+    """Yield filtered chunks of the export with only `columns` read."""
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows):
+        chunk = filter_chunk(chunk, regions, since)
+        if len(chunk):
+            yield chunk
+
+
+def chunk_rows_for_budget(path, columns, max_memory_mb, baseline_mb=0.0):
+    """Rows per chunk so a chunk stays within max_memory_mb above baseline_mb."""
+    sample = pd.read_csv(path, usecols=columns, nrows=SAMPLE_ROWS)
+    per_row = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    budget = (max_memory_mb - baseline_mb - READER_OVERHEAD_MB) * 1024 * 1024
+    if budget <= 0:
+        raise SystemExit(f"Memory cap of {max_memory_mb:.0f}MB leaves no room for chunks: "
+                         f"{baseline_mb:.0f}MB already in use, {READER_OVERHEAD_MB}MB reader overhead")
+    return max(int(budget / (per_row * CHUNK_OVERHEAD)), 1000)
+
+
+class PartialAggregate:
+    """Running grouped aggregate of one rollup, folded chunk by chunk."""
+
+    def __init__(self, spec):
+        self.by = list(spec['by'])
+        self.value = spec['value']
+        self.agg = spec.get('agg', 'sum')
+        self.rename = spec.get('rename', {})
+        self.partial = None
+
+    def add(self, chunk):
+        grouped = chunk.groupby(self.by)[self.value].agg(self.agg).reset_index()
+        self.merge(grouped)
+
+    def merge(self, grouped):
+        """Fold another partial result (same keys and value column) into this one."""
+        if self.partial is None:
+            self.partial = grouped
+            return
+        combined = pd.concat([self.partial, grouped], ignore_index=True)
+        self.partial = combined.groupby(self.by)[self.value].agg(MERGE_AGG[self.agg]).reset_index()
+
+    def result(self):
+        if self.partial is None:
+            return pd.DataFrame(columns=self.by + [self.value]).rename(columns=self.rename)
+        return self.partial.rename(columns=self.rename)
+
+
+def aggregate(path, rollups=None, chunk_rows=CHUNK_ROWS, regions=REGIONS, since=CUTOFF):
+    """Compute every rollup in a single scan of the export; return name -> DataFrame."""
+    rollups = ROLLUPS if rollups is None else rollups
+    partials = {name: PartialAggregate(spec) for name, spec in rollups.items()}
+    derived = sorted({key for spec in rollups.values() for key in spec['by'] if key in DERIVED})
+    kept = 0
+    for chunk in iter_chunks(path, needed_columns(rollups), chunk_rows, regions, since):
+        kept += len(chunk)
+        for key in derived:
+            chunk[key] = DERIVED[key](chunk)
+        for partial in partials.values():
+            partial.add(chunk)
+    print(f"  {kept} matching rows aggregated into {len(rollups)} rollups")
+    return {name: partial.result() for name, partial in partials.items()}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compute ACLED rollups in one chunked scan.")
+    parser.add_argument('--input', default=str(INPUT_PATH), help="ACLED aggregated export (CSV)")
+    parser.add_argument('--output-dir', default=str(DATASET_DIR), help="Directory for the rollup CSVs")
+    parser.add_argument('--rollups', help="JSON file with additional rollup declarations")
+    parser.add_argument('--only', nargs='+', help="Compute only these rollups")
+    parser.add_argument('--since', default=CUTOFF, help=f"First week to include (default: {CUTOFF})")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Rows read per chunk")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    rollups = dict(ROLLUPS)
+    if args.rollups:
+        rollups.update(load_rollups(args.rollups))
+    if args.only:
+        unknown = [name for name in args.only if name not in rollups]
+        if unknown:
+            raise SystemExit(f"Unknown rollup(s): {', '.join(unknown)}")
+        rollups = {name: rollups[name] for name in args.only}
+
+    print(f"Aggregating {args.input} in chunks of {args.chunk_rows} rows...")
+    results = aggregate(args.input, rollups, args.chunk_rows, since=args.since)
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, df in results.items():
+        path = os.path.join(args.output_dir, f'{name}.csv')
+        df.to_csv(path, index=False)
+        print(f"  ✓ Saved: {path} ({len(df)} rows)")
+
+
+if __name__ == "__main__":
+    main()
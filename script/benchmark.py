@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the preprocessing pipelines in script/.
+
+Every case runs on synthetic data scaled from the size of the real inputs
+(1x, 10x, 100x, ...) in a fresh child process, and records wall time, peak
+RSS and throughput. Results are appended to a JSON history file; --compare
+checks the new results against the previous run and exits with status 1 if
+any case got slower or used more memory than the threshold allows.
+
+Usage:
+  python script/benchmark.py                              # all cases at 1x
+  python script/benchmark.py --scales 1 10 100 --cases acled_aggregations health_incidents
+  python script/benchmark.py --scales 1 10 --repeat 3 --compare --threshold 0.15
+  python script/benchmark.py --cases health_descriptions health_descriptions_rowwise --scales 400  # ~1M rows
+  python script/benchmark.py --list
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATASET_DIR = PROJECT_ROOT / 'src' / 'Dataset'
+HISTORY_PATH = Path(__file__).parent / 'benchmark_history.json'
+
+HEALTH_CSV = '2023-2024-pse-shcc-health-care-data.csv'
+WORLD_BANK_CSVS = ['GDP.csv', 'SafelyDrinkingServices.csv',
+                   'SafelySanitationServices.csv', 'FoodInsecurity.csv']
+
+# Sizes of the real inputs at 1x
+DAMAGE_POINTS = 198308      # points behind Damage_Sites_clusters_500m.geojson
+TERRITORY_FEATURES = 352    # Israel.gpkg + Palestine.gdb admin0
+TERRITORY_VERTICES = 600    # average vertices per territory feature
+ACLED_ROWS = 250000         # order of magnitude of the Middle East aggregated export
+INCIDENTS = 3484            # rows of Combined_Incidents_GeoChart.csv
+EPS = 500
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def synthetic_damage_points(scale, seed=0):
+    from benchmark_clusters import synthetic_points
+    return synthetic_points(int(DAMAGE_POINTS * scale), seed=seed)
+
+
+def synthetic_health_csv(path, scale, seed=0):
+    """Resample rows of the real health-care CSV, keeping its '#' tag row."""
+    import pandas as pd
+    df = pd.read_csv(DATASET_DIR / HEALTH_CSV, dtype=str, keep_default_na=False)
+    rows = df.iloc[1:]
+    sample = rows.sample(n=int(len(rows) * scale), replace=True, random_state=seed)
+    pd.concat([df.iloc[:1], sample]).to_csv(path, index=False)
+    return len(sample)
+
+
+def synthetic_health_frame(scale, seed=0):
+    """Resampled rows of the real health-care CSV as a DataFrame."""
+    import pandas as pd
+    df = pd.read_csv(DATASET_DIR / HEALTH_CSV, skiprows=[1])
+    return df.sample(n=int(len(df) * scale), replace=True, random_state=seed).reset_index(drop=True)
+
+
+def rowwise_health_description(row):
+    """Original per-row description, kept as the reference for the vectorized one."""
+    import pandas as pd
+    parts = []
+    if row['Number of Attacks on Health Facilities Reporting Destruction'] > 0:
+        parts.append(f"{int(row['Number of Attacks on Health Facilities Reporting Destruction'])} facility(ies) destroyed")
+    if row['Number of Attacks on Health Facilities Reporting Damaged'] > 0:
+        parts.append(f"{int(row['Number of Attacks on Health Facilities Reporting Damaged'])} facility(ies) damaged")
+    casualties = []
+    if row['Health Workers Killed'] > 0:
+        casualties.append(f"{int(row['Health Workers Killed'])} killed")
+    if row['Health Workers Injured'] > 0:
+        casualties.append(f"{int(row['Health Workers Injured'])} injured")
+    if row['Health Workers Kidnapped'] > 0:
+        casualties.append(f"{int(row['Health Workers Kidnapped'])} kidnapped")
+    if row['Health Workers Arrested'] > 0:
+        casualties.append(f"{int(row['Health Workers Arrested'])} arrested")
+    if casualties:
+        profession = row['Reported Health Worker Profession'] if pd.notna(row['Reported Health Worker Profession']) else "health workers"
+        parts.append(f"{profession}: {', '.join(casualties)}")
+    if row['Forceful Entry into Health Facility'] > 0:
+        parts.append("forceful entry")
+    if row['Occupation of Health Facility'] > 0:
+        parts.append("facility occupation")
+    if row['Vicinity of Health Facility Affected'] > 0:
+        parts.append("vicinity affected")
+    if row['Access Denied or Obstructed']:
+        parts.append("access obstructed")
+    if row['Health Transportation Destroyed'] > 0:
+        parts.append(f"{int(row['Health Transportation Destroyed'])} ambulance(s) destroyed")
+    if row['Health Transportation Damaged'] > 0:
+        parts.append(f"{int(row['Health Transportation Damaged'])} ambulance(s) damaged")
+    return "; ".join(parts) if parts else "Health facility incident"
+
+
+def synthetic_world_bank_csvs(directory, scale):
+    """Copy the World Bank CSVs with the non-target rows repeated `scale` times.
+
+    Copies get a numbered country label, so the filtered and melted output
+    keeps its size and only the number of countries to scan grows.
+    """
+    import pandas as pd
+    from SmallMultipleDatasetProcessing import COUNTRIES
+    total = 0
+    for name in WORLD_BANK_CSVS:
+        df = pd.read_csv(DATASET_DIR / name)
+        others = df[~df['REF_AREA_LABEL'].isin(COUNTRIES)]
+        copies = [df]
+        for k in range(1, int(scale)):
+            copy = others.copy()
+            copy['REF_AREA_LABEL'] = copy['REF_AREA_LABEL'] + f' {k}'
+            copies.append(copy)
+        out = pd.concat(copies, ignore_index=True)
+        out.to_csv(os.path.join(directory, name), index=False)
+        total += len(out)
+    return total
+
+
+def synthetic_acled(scale, seed=0):
+    """ACLED-like weekly aggregated rows for the Middle East."""
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    n = int(ACLED_ROWS * scale)
+    places = [('Israel', 'HaMerkaz'), ('Israel', 'Southern'), ('Israel', 'Northern'),
+              ('Palestine', 'Gaza Strip'), ('Palestine', 'West Bank'),
+              ('Lebanon', 'South'), ('Syria', 'Aleppo'), ('Iraq', 'Baghdad'),
+              ('Yemen', "Sana'a"), ('Bahrain', 'Capital')]
+    sub_events = {
+        'Battles': ['Armed clash', 'Government regains territory'],
+        'Explosions/Remote violence': ['Air/drone strike', 'Shelling/artillery/missile attack',
+                                       'Remote explosive/landmine/IED'],
+        'Violence against civilians': ['Attack', 'Abduction/forced disappearance'],
+        'Protests': ['Peaceful protest', 'Protest with intervention'],
+        'Riots': ['Violent demonstration', 'Mob violence'],
+        'Strategic developments': ['Looting/property destruction', 'Arrests'],
+    }
+    pairs = [(e, s) for e, subs in sub_events.items() for s in subs]
+    weeks = pd.date_range('2016-01-02', '2025-12-06', freq='W-SAT')
+    place = rng.integers(len(places), size=n)
+    pair = rng.integers(len(pairs), size=n)
+    return pd.DataFrame({
+        'WEEK': weeks[rng.integers(len(weeks), size=n)].strftime('%Y-%m-%d'),
+        'REGION': 'Middle East',
+        'COUNTRY': [places[i][0] for i in place],
+        'ADMIN1': [places[i][1] for i in place],
+        'EVENT_TYPE': [pairs[i][0] for i in pair],
+        'SUB_EVENT_TYPE': [pairs[i][1] for i in pair],
+        'EVENTS': rng.integers(1, 20, size=n),
+        'FATALITIES': rng.poisson(2.0, size=n),
+        'POPULATION_EXPOSURE': np.nan,
+        'DISORDER_TYPE': 'Political violence',
+        'ID': place + 100,
+        'CENTROID_LATITUDE': 31.5,
+        'CENTROID_LONGITUDE': 34.5,
+    })
+
+
+def synthetic_territories(scale, seed=0):
+    """GeoDataFrame of irregular two-part MultiPolygons in WGS84."""
+    import geopandas as gpd
+    import shapely
+    rng = np.random.default_rng(seed)
+    n = int(TERRITORY_FEATURES * scale)
+    per_ring = TERRITORY_VERTICES // 2
+    angles = np.linspace(0.0, 2.0 * np.pi, per_ring, endpoint=False)
+    geoms = []
+    for _ in range(n):
+        parts = []
+        for _ in range(2):
+            cx, cy = rng.uniform(34.2, 35.9), rng.uniform(29.5, 33.3)
+            radius = rng.uniform(0.005, 0.05) * rng.uniform(0.7, 1.0, size=per_ring)
+            ring = np.column_stack((cx + radius * np.cos(angles), cy + radius * np.sin(angles)))
+            parts.append(shapely.Polygon(ring))
+        geoms.append(shapely.MultiPolygon(parts))
+    country = np.where(rng.random(n) < 0.9, 'Israel', 'Palestine')
+    population = rng.uniform(0, 1e5, size=n)
+    population[rng.random(n) < 0.1] = np.nan
+    return gpd.GeoDataFrame({
+        'name': [f'Territory {i}' for i in range(n)],
+        'admin_level': rng.integers(2, 9, size=n),
+        'population': population,
+        'country': country,
+        'territory': country,
+    }, geometry=geoms, crs='EPSG:4326')
+
+
+# ---------------------------------------------------------------------------
+# Cases: setup(scale, workdir) -> (run, items). Only run() is timed.
+# ---------------------------------------------------------------------------
+
+def setup_cluster_points(scale, workdir):
+    from damage_sites_to_clusters import cluster_points
+    points = synthetic_damage_points(scale)
+    return (lambda: cluster_points(points, EPS, engine='numpy')), len(points)
+
+
+def setup_merge_clusters(scale, workdir):
+    from damage_sites_to_clusters import cluster_points, merge_overlapping_clusters
+    clusters = cluster_points(synthetic_damage_points(scale), EPS, engine='numpy')
+    return (lambda: merge_overlapping_clusters(clusters)), len(clusters)
+
+
+def setup_health_incidents(scale, workdir):
+    # The script reads a relative src/Dataset path
+    os.makedirs(os.path.join(workdir, 'src', 'Dataset'), exist_ok=True)
+    rows = synthetic_health_csv(os.path.join(workdir, 'src', 'Dataset', HEALTH_CSV), scale)
+    os.chdir(workdir)
+    from GeoChartPreprocessing import process_health_incidents
+    return process_health_incidents, rows
+
+
+def _setup_health_read(scale, workdir, read):
+    path = os.path.join(workdir, HEALTH_CSV)
+    rows = synthetic_health_csv(path, scale)
+    return (lambda: read(path)), rows
+
+
+def setup_health_read_untyped(scale, workdir):
+    import pandas as pd
+    return _setup_health_read(scale, workdir, lambda path: pd.read_csv(path, skiprows=[1]))
+
+
+def setup_health_read_typed(scale, workdir):
+    from incident_sources import read_source
+    return _setup_health_read(scale, workdir, lambda path: read_source('health', path))
+
+
+def setup_health_read_pyarrow(scale, workdir):
+    from incident_sources import read_source
+    return _setup_health_read(scale, workdir, lambda path: read_source('health', path, engine='pyarrow'))
+
+
+def setup_health_descriptions(scale, workdir):
+    from GeoChartPreprocessing import create_health_descriptions
+    df = synthetic_health_frame(scale)
+    return (lambda: create_health_descriptions(df)), len(df)
+
+
+def setup_health_descriptions_rowwise(scale, workdir):
+    df = synthetic_health_frame(scale)
+    return (lambda: df.apply(rowwise_health_description, axis=1)), len(df)
+
+
+def setup_geojson_properties(scale, workdir):
+    from unified_territory_converter import save_geojson
+    gdf = synthetic_territories(scale)
+    path = os.path.join(workdir, 'territories.geojson')
+    return (lambda: save_geojson(gdf, path)), len(gdf)
+
+
+def setup_calculate_bounds(scale, workdir):
+    from unified_territory_converter import calculate_bounds
+    gdf = synthetic_territories(scale)
+    return (lambda: calculate_bounds(gdf)), len(gdf)
+
+
+def setup_layer_read(scale, workdir):
+    from layer_reader import read_layer
+    path = os.path.join(workdir, 'territories.gpkg')
+    synthetic_territories(scale).to_file(path, layer='territories', engine='pyogrio')
+    # Two columns of a layer, limited to the southern half of the extent
+    return (lambda: read_layer(path, layer='territories', columns=['name', 'country'],
+                               bbox=(34.2, 29.5, 35.9, 31.4))), int(TERRITORY_FEATURES * scale)
+
+
+def setup_acled_aggregations(scale, workdir):
+    import preprocessing
+    df = synthetic_acled(scale)
+
+    def run():
+        recent = preprocessing.recent_weeks(preprocessing.filter_israel_gaza(df))
+        preprocessing.fatalities_per_month(recent)
+        preprocessing.events_per_week(recent)
+        preprocessing.events_sankey(recent)
+    return run, len(df)
+
+
+def _write_acled_csv(path, scale):
+    df = synthetic_acled(scale)
+    df.to_csv(path, index=False)
+    return len(df)
+
+
+def _setup_acled_csv(scale, workdir):
+    # Written by another process so generating it does not count toward peak RSS
+    path = os.path.join(workdir, 'acled.csv')
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        rows = pool.submit(_write_acled_csv, path, scale).result()
+    return path, rows
+
+
+def setup_acled_csv_full(scale, workdir):
+    import preprocessing
+    path, rows = _setup_acled_csv(scale, workdir)
+
+    def run():
+        recent = preprocessing.load_recent_events(path)
+        preprocessing.fatalities_per_month(recent)
+        preprocessing.events_per_week(recent)
+        preprocessing.events_sankey(recent)
+    return run, rows
+
+
+def setup_acled_rollups(scale, workdir):
+    from acled_rollups import aggregate
+    path, rows = _setup_acled_csv(scale, workdir)
+    return (lambda: aggregate(path)), rows
+
+
+def setup_municipality_join(scale, workdir):
+    import pandas as pd
+    from municipality_join import MAP_BOUNDARIES, load_municipalities, tag_municipalities
+    municipalities = load_municipalities(PROJECT_ROOT / MAP_BOUNDARIES)
+    rng = np.random.default_rng(0)
+    n = int(INCIDENTS * scale)
+    # Around the Gaza Strip, with a share of points outside every municipality
+    df = pd.DataFrame({'longitude': rng.uniform(34.2, 34.6, n), 'latitude': rng.uniform(31.2, 31.6, n)})
+    return (lambda: tag_municipalities(df, municipalities)), n
+
+
+def setup_small_multiples(scale, workdir):
+    import SmallMultipleDatasetProcessing as sm
+    sm.dataset_dir = sm.output_dir = workdir
+    rows = synthetic_world_bank_csvs(workdir, scale)
+
+    def run():
+        sm.create_combined_dataset(sm.process_gdp(), sm.process_drinking_water(),
+                                   sm.process_sanitation(), sm.process_food_insecurity())
+    return run, rows
+
+
+CASES = {
+    'cluster_points': setup_cluster_points,
+    'merge_overlapping_clusters': setup_merge_clusters,
+    'health_incidents': setup_health_incidents,
+    'health_read_untyped': setup_health_read_untyped,
+    'health_read_typed': setup_health_read_typed,
+    'health_read_pyarrow': setup_health_read_pyarrow,
+    'health_descriptions': setup_health_descriptions,
+    'health_descriptions_rowwise': setup_health_descriptions_rowwise,
+    'geojson_properties': setup_geojson_properties,
+    'calculate_bounds': setup_calculate_bounds,
+    'layer_read': setup_layer_read,
+    'acled_aggregations': setup_acled_aggregations,
+    'acled_csv_full': setup_acled_csv_full,
+    'acled_rollups': setup_acled_rollups,
+    'small_multiples': setup_small_multiples,
+    'municipality_join': setup_municipality_join,
+}
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _measure(name, scale):
+    """Child process: set up one case and time its run."""
+    with tempfile.TemporaryDirectory() as workdir, \
+            contextlib.redirect_stdout(io.StringIO()):
+        # A fresh stage store, so cached intermediates are never reused
+        import stage_store
+        stage_store.STORE_DIR = os.path.join(workdir, 'cache')
+        run, items = CASES[name](scale, workdir)
+        setup_rss = peak_rss_mb()
+        start = time.perf_counter()
+        run()
+        wall = time.perf_counter() - start
+        os.chdir(PROJECT_ROOT)
+    return {'items': items, 'wall_s': wall, 'setup_rss_mb': setup_rss,
+            'peak_rss_mb': peak_rss_mb()}
+
+
+def measure(name, scale, repeat=1):
+    """Best of `repeat` runs, each in a fresh process so RSS is per case."""
+    best = None
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            result = pool.submit(_measure, name, scale).result()
+        if best is None or result['wall_s'] < best['wall_s']:
+            best = result
+    best['throughput'] = best['items'] / best['wall_s'] if best['wall_s'] > 0 else None
+    return best
+
+
+# ---------------------------------------------------------------------------
+# History
+# ---------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+
+
+def compare_runs(previous, current, threshold):
+    """Return regression messages for cases present in both runs."""
+    before = {(r['case'], r['scale']): r for r in previous['results']}
+    regressions = []
+    for r in current['results']:
+        old = before.get((r['case'], r['scale']))
+        if old is None:
+            continue
+        label = f"{r['case']} @ {r['scale']:g}x"
+        if r['wall_s'] > old['wall_s'] * (1 + threshold):
+            regressions.append(f"{label}: wall time {old['wall_s']:.3f}s -> {r['wall_s']:.3f}s "
+                               f"(+{(r['wall_s'] / old['wall_s'] - 1) * 100:.0f}%)")
+        if r['peak_rss_mb'] and old['peak_rss_mb'] and \
+                r['peak_rss_mb'] > old['peak_rss_mb'] * (1 + threshold):
+            regressions.append(f"{label}: peak RSS {old['peak_rss_mb']:.0f}MB -> "
+                               f"{r['peak_rss_mb']:.0f}MB "
+                               f"(+{(r['peak_rss_mb'] / old['peak_rss_mb'] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the script/ preprocessing pipelines.")
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES),
+                        help="Cases to run (default: all)")
+    parser.add_argument('--scales', nargs='+', type=float, default=[1.0],
+                        help="Input sizes relative to the real datasets (e.g. 1 10 100)")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Runs per case; the fastest one is recorded")
+    parser.add_argument('--history', default=str(HISTORY_PATH),
+                        help="JSON history file results are appended to")
+    parser.add_argument('--no-save', action='store_true',
+                        help="Do not append this run to the history")
+    parser.add_argument('--compare', action='store_true',
+                        help="Compare with the previous run and exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Relative slowdown / memory growth flagged as a regression")
+    parser.add_argument('--list', action='store_true', help="List the cases and exit")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.list:
+        for name in CASES:
+            print(name)
+        return
+
+    results = []
+    print(f"{'case':<28} {'scale':>6} {'items':>10} {'wall':>9} {'peak RSS':>10} {'items/s':>12}")
+    for name in args.cases:
+        for scale in args.scales:
+            r = measure(name, scale, args.repeat)
+            results.append({'case': name, 'scale': scale, **r})
+            rss = f"{r['peak_rss_mb']:.0f}MB" if r['peak_rss_mb'] else 'n/a'
+            rate = f"{r['throughput']:,.0f}" if r['throughput'] else 'n/a'
+            print(f"{name:<28} {scale:>5g}x {r['items']:>10} {r['wall_s']:>8.3f}s {rss:>10} {rate:>12}")
+
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    history = load_history(args.history)
+
+    regressions = []
+    if args.compare:
+        if history:
+            regressions = compare_runs(history[-1], run, args.threshold)
+            print(f"\nCompared with run {history[-1]['timestamp']} ({history[-1]['commit']}):")
+            for message in regressions:
+                print(f"  ✗ {message}")
+            if not regressions:
+                print(f"  ✓ No regressions above {args.threshold * 100:.0f}%")
+        else:
+            print("\nNo previous run to compare with")
+
+    if not args.no_save:
+        history.append(run)
+        save_history(args.history, history)
+        print(f"\n✓ Appended results to {args.history}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
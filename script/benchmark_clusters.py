@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Time damage-site clustering and cluster merging.
+
+Points are drawn around random damage hotspots inside the Gaza Strip bounding
+box, or read from a damage-site GeoJSON with --input. Both clustering engines
+are timed and compared, and for sizes small enough the merge result is checked
+against the original pairwise merge loop.
+
+Usage:
+  python script/benchmark_clusters.py --sizes 10000 100000 1000000 --eps 500
+  python script/benchmark_clusters.py --input src/GazaMap/Damage_Sites_GazaStrip_20251011_slim.geojson
+  python script/benchmark_clusters.py --sizes 1000000 --workers 1 2 4 8
+"""
+
+import argparse
+import math
+import random
+import time
+
+from damage_sites_to_clusters import cluster_points, merge_overlapping_clusters
+from geojson_stream import iter_points
+from tiled_clusters import cluster_points_tiled
+
+# Gaza Strip bounding box (lon/lat)
+GAZA_BBOX = (34.22, 31.22, 34.57, 31.60)
+
+def synthetic_points(n, seed=0, hotspots=None, spread_m=200.0):
+    """Generate n lon/lat points scattered around random hotspots.
+
+    By default there is one hotspot per 1000 points, so every size has dense
+    neighbourhoods whose clusters overlap and have to be merged.
+    """
+    rng = random.Random(seed)
+    if hotspots is None:
+        hotspots = max(n // 1000, 1)
+    min_lon, min_lat, max_lon, max_lat = GAZA_BBOX
+    centers = [(rng.uniform(min_lon, max_lon), rng.uniform(min_lat, max_lat))
+               for _ in range(hotspots)]
+    # Degrees per metre at Gaza's latitude
+    deg_lat = 1.0 / 111320.0
+    deg_lon = deg_lat / math.cos(math.radians((min_lat + max_lat) / 2.0))
+    points = []
+    for _ in range(n):
+        lon, lat = centers[rng.randrange(hotspots)]
+        points.append((lon + rng.gauss(0.0, spread_m) * deg_lon,
+                       lat + rng.gauss(0.0, spread_m) * deg_lat))
+    return points
+
+def pairwise_merge(clusters):
+    """Original merge loop, kept as the reference for equality checks."""
+    while True:
+        merged_any = False
+        new_clusters = []
+        merged_mask = [False] * len(clusters)
+        for i in range(len(clusters)):
+            if merged_mask[i]:
+                continue
+            current = clusters[i]
+            for j in range(i + 1, len(clusters)):
+                if merged_mask[j]:
+                    continue
+                if current.overlaps(clusters[j]):
+                    current.merge(clusters[j])
+                    merged_mask[j] = True
+                    merged_any = True
+            new_clusters.append(current)
+        if not merged_any:
+            return new_clusters
+        clusters = new_clusters
+
+def summarize(clusters):
+    return [c.indices for c in clusters]
+
+def max_sum_difference(a, b):
+    """Largest difference between the coordinate sums of matching clusters."""
+    return max((max(abs(x.sum_x - y.sum_x), abs(x.sum_y - y.sum_y)) for x, y in zip(a, b)),
+               default=0.0)
+
+def load_points(path):
+    """Read Point coordinates from a GeoJSON file, streaming it like the clustering script."""
+    return list(iter_points(path))
+
+def run_tiled(label, points, eps, workers, reference):
+    """Time the tiled engine for each worker count against the NumPy engine."""
+    base = None
+    for w in workers:
+        t0 = time.perf_counter()
+        clusters = cluster_points_tiled(points, eps, workers=w)
+        elapsed = time.perf_counter() - t0
+        base = base or elapsed
+        same = ([(c.indices, c.sum_x, c.sum_y) for c in clusters]
+                == [(c.indices, c.sum_x, c.sum_y) for c in reference])
+        print(f"{label}: tiled {w} worker(s) {elapsed:.2f}s ({base / elapsed:.1f}x), "
+              f"identical to numpy engine: {same}")
+
+def run(label, points, eps, check, workers=()):
+    timings = {}
+    results = {}
+    for engine in ('python', 'numpy'):
+        t0 = time.perf_counter()
+        results[engine] = cluster_points(points, eps, engine=engine)
+        timings[engine] = time.perf_counter() - t0
+    same_clusters = ([c.indices for c in results['python']]
+                     == [c.indices for c in results['numpy']])
+    print(f"{label}: cluster python {timings['python']:.2f}s, numpy {timings['numpy']:.2f}s "
+          f"({timings['python'] / timings['numpy']:.1f}x), identical clusters: {same_clusters}, "
+          f"max centroid sum difference {max_sum_difference(results['python'], results['numpy']):.1e}m")
+
+    if workers:
+        run_tiled(label, points, eps, workers, results['numpy'])
+
+    clusters = results['numpy']
+    n_initial = len(clusters)
+    t0 = time.perf_counter()
+    merged = merge_overlapping_clusters(clusters)
+    t_merge = time.perf_counter() - t0
+    print(f"{label}: {n_initial} -> {len(merged)} clusters, grid merge {t_merge:.2f}s")
+
+    if check:
+        reference = results['python']
+        t0 = time.perf_counter()
+        reference = pairwise_merge(reference)
+        t_ref = time.perf_counter() - t0
+        same = summarize(reference) == summarize(merged)
+        print(f"{label}: pairwise merge {t_ref:.2f}s, identical output: {same}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--input', help='benchmark on a damage-site GeoJSON instead of synthetic points')
+    parser.add_argument('--eps', type=float, default=500.0)
+    parser.add_argument('--workers', type=int, nargs='*', default=[],
+                        help='also time the tiled engine with these worker counts (e.g. 1 2 4 8)')
+    parser.add_argument('--check-up-to', type=int, default=10000,
+                        help='compare with the pairwise loop up to this many points')
+    args = parser.parse_args()
+
+    if args.input:
+        points = load_points(args.input)
+        run(f"{args.input} ({len(points)} points)", points, args.eps,
+            len(points) <= args.check_up_to, args.workers)
+        return
+
+    for n in args.sizes:
+        run(f"n={n}", synthetic_points(n), args.eps, n <= args.check_up_to, args.workers)
+
+if __name__ == '__main__':
+    main()
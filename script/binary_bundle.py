@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Column-oriented binary bundles for the processed datasets.
+
+A bundle is one file:
+
+  bytes 0-3   magic "DVB1"
+  bytes 4-7   uint32 (little-endian) length of the JSON header
+  header      UTF-8 JSON schema, padded with spaces to a multiple of 8 bytes
+  body        column blocks, each starting at a multiple of 8 bytes
+
+The header lists the row count and, per column, its encoding and the byte
+offset / length of its blocks relative to the start of the body, so every
+block can be viewed as a typed array without copying:
+
+  numeric     little-endian int8..int32 / uint8..uint32 / float32 / float64,
+              the smallest type that holds the values exactly (NaN = null)
+  bool        uint8 0/1
+  dictionary  "dictionary" lists the distinct strings; the block holds codes
+              (int8/int16/int32, -1 = null)
+  utf8        "offsets" block of int32 (rows + 1) into a UTF-8 "data" block;
+              an optional "validity" uint8 block marks nulls
+  date        int32 days since 1970-01-01 ("unit": "days") if every value is
+              at midnight, otherwise float64 milliseconds ("unit": "ms");
+              NaN / INT32_MIN = null
+
+Usage:
+  from binary_bundle import write_bundle
+  write_bundle(df, 'src/Dataset/processed/Combined_SmallMultiple.bin')
+
+  python script/binary_bundle.py src/Dataset/processed/*.csv   # size/decode report
+"""
+
+import argparse
+import gzip
+import json
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'DVB1'
+ALIGN = 8
+# Strings with at most this share of distinct values are dictionary-encoded
+DICTIONARY_RATIO = 0.5
+INT_TYPES = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32]
+DAY_MS = 86400000
+
+
+def _pad(n):
+    return (-n) % ALIGN
+
+
+def _smallest_int(values):
+    lo, hi = (int(values.min()), int(values.max())) if len(values) else (0, 0)
+    for t in INT_TYPES:
+        info = np.iinfo(t)
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(t)
+    return None
+
+
+def _numeric_block(values):
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu':
+        dtype = _smallest_int(values)
+        if dtype is not None:
+            return values.astype(dtype.newbyteorder('<'))
+        values = values.astype(np.float64)
+    values = values.astype(np.float64)
+    as32 = values.astype(np.float32)
+    if np.array_equal(as32.astype(np.float64), values, equal_nan=True):
+        return as32.astype('<f4')
+    return values.astype('<f8')
+
+
+def _encode_column(series):
+    """Return (column schema without offsets, list of (block name, bytes))."""
+    if isinstance(series.dtype, pd.PeriodDtype):
+        series = series.astype(str)
+
+    if pd.api.types.is_bool_dtype(series) and not series.isna().any():
+        return {'encoding': 'bool', 'dtype': 'uint8'}, [('values', series.to_numpy(np.uint8).tobytes())]
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        ms = series.astype('datetime64[ms]').to_numpy().astype(np.int64)
+        valid = series.notna().to_numpy()
+        if (ms[valid] % DAY_MS == 0).all():
+            days = np.where(valid, ms // DAY_MS, np.iinfo(np.int32).min).astype('<i4')
+            return {'encoding': 'date', 'unit': 'days', 'dtype': 'int32'}, [('values', days.tobytes())]
+        millis = np.where(valid, ms.astype(np.float64), np.nan).astype('<f8')
+        return {'encoding': 'date', 'unit': 'ms', 'dtype': 'float64'}, [('values', millis.tobytes())]
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        if series.isna().any():
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            values = series.to_numpy()
+        block = _numeric_block(values)
+        return {'encoding': 'numeric', 'dtype': _JS_TYPES[block.dtype.str]}, [('values', block.tobytes())]
+
+    # Strings (object, str, categorical, mixed): stringify non-null values
+    valid = series.notna().to_numpy()
+    strings = series.astype(object).to_numpy()
+    strings = np.array([str(v) if ok else '' for v, ok in zip(strings, valid)], dtype=object)
+    codes, uniques = pd.factorize(np.where(valid, strings, None), use_na_sentinel=True)
+    if len(strings) and len(uniques) <= DICTIONARY_RATIO * len(strings):
+        dtype = np.int8 if len(uniques) < 128 else np.int16 if len(uniques) < 32768 else np.int32
+        block = codes.astype(np.dtype(dtype).newbyteorder('<'))
+        return ({'encoding': 'dictionary', 'dtype': _JS_TYPES[block.dtype.str],
+                 'dictionary': [str(u) for u in uniques]},
+                [('values', block.tobytes())])
+
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i4')
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blocks = [('offsets', offsets.tobytes()), ('data', b''.join(encoded))]
+    if not valid.all():
+        blocks.append(('validity', valid.astype(np.uint8).tobytes()))
+    return {'encoding': 'utf8'}, blocks
+
+
+_JS_TYPES = {'|i1': 'int8', '|u1': 'uint8', '<i2': 'int16', '<u2': 'uint16',
+             '<i4': 'int32', '<u4': 'uint32', '<f4': 'float32', '<f8': 'float64'}
+_NP_TYPES = {v: k for k, v in _JS_TYPES.items()}
+
+
+def write_bundle(df, path):
+    """Write a DataFrame as a binary bundle; return the file size in bytes."""
+    columns = []
+    body = bytearray()
+    for name in df.columns:
+        schema, blocks = _encode_column(df[name])
+        schema = {'name': str(name), **schema}
+        for block_name, data in blocks:
+            schema[block_name] = {'offset': len(body), 'byteLength': len(data)}
+            body += data + b'\0' * _pad(len(data))
+        columns.append(schema)
+
+    header = json.dumps({'version': 1, 'rows': len(df), 'columns': columns},
+                        separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    header += b' ' * _pad(8 + len(header))
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        f.write(body)
+    return os.path.getsize(path)
+
+
+def read_bundle(path):
+    """Decode a bundle back into a DataFrame."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if raw[:4] != MAGIC:
+        raise ValueError(f"{path} is not a binary bundle")
+    (header_len,) = struct.unpack_from('<I', raw, 4)
+    header = json.loads(raw[8:8 + header_len].decode('utf-8'))
+    body = memoryview(raw)[8 + header_len:]
+    rows = header['rows']
+
+    def block(col, name, dtype):
+        info = col[name]
+        return np.frombuffer(body, dtype=dtype, count=info['byteLength'] // np.dtype(dtype).itemsize,
+                             offset=info['offset'])
+
+    data = {}
+    for col in header['columns']:
+        encoding = col['encoding']
+        if encoding == 'numeric':
+            data[col['name']] = block(col, 'values', _NP_TYPES[col['dtype']])
+        elif encoding == 'bool':
+            data[col['name']] = block(col, 'values', np.uint8).astype(bool)
+        elif encoding == 'date':
+            values = block(col, 'values', _NP_TYPES[col['dtype']])
+            if col['unit'] == 'days':
+                ms = np.where(values == np.iinfo(np.int32).min, np.nan, values.astype(np.float64) * DAY_MS)
+            else:
+                ms = values
+            data[col['name']] = pd.to_datetime(ms, unit='ms')
+        elif encoding == 'dictionary':
+            codes = block(col, 'values', _NP_TYPES[col['dtype']])
+            data[col['name']] = pd.Categorical.from_codes(codes, categories=col['dictionary'])
+        else:
+            offsets = block(col, 'offsets', '<i4')
+            text = bytes(block(col, 'data', np.uint8)).decode('utf-8') if col['data']['byteLength'] else ''
+            # Offsets are in bytes; decode per row when the text is not pure ASCII
+            if len(text) == col['data']['byteLength']:
+                values = [text[offsets[i]:offsets[i + 1]] for i in range(rows)]
+            else:
+                raw_text = bytes(block(col, 'data', np.uint8))
+                values = [raw_text[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(rows)]
+            if 'validity' in col:
+                valid = block(col, 'validity', np.uint8).astype(bool)
+                values = [v if ok else None for v, ok in zip(values, valid)]
+            data[col['name']] = values
+    return pd.DataFrame(data, index=pd.RangeIndex(rows))
+
+
+def write_with_bundle(df, csv_path):
+    """Write the CSV artifact and its binary bundle next to it (.bin)."""
+    df.to_csv(csv_path, index=False)
+    write_bundle(df, os.path.splitext(str(csv_path))[0] + '.bin')
+
+
+def _best_time(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(csv_paths):
+    """Compare the sizes and decode times of CSVs and their bundles.
+
+    The bundle the pipeline wrote next to each CSV is measured as it is.
+    CSVs without one get a bundle converted from the CSV in a temporary
+    directory (marked with *), so pipeline artifacts are never overwritten.
+    """
+    width = max(len('dataset'), *(len(os.path.basename(p)) + 1 for p in csv_paths))
+    print(f"{'dataset':<{width}} {'csv':>9} {'csv.gz':>9} {'bin':>9} {'bin.gz':>9} "
+          f"{'csv decode':>11} {'bin decode':>11}")
+    converted = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for csv_path in csv_paths:
+            name = os.path.basename(csv_path)
+            bin_path = os.path.splitext(csv_path)[0] + '.bin'
+            if not os.path.exists(bin_path):
+                bin_path = os.path.join(tmp_dir, os.path.splitext(name)[0] + '.bin')
+                write_bundle(pd.read_csv(csv_path), bin_path)
+                name += '*'
+                converted = True
+            with open(csv_path, 'rb') as f:
+                csv_bytes = f.read()
+            with open(bin_path, 'rb') as f:
+                bin_bytes = f.read()
+            csv_time = _best_time(lambda: pd.read_csv(csv_path))
+            bin_time = _best_time(lambda: read_bundle(bin_path))
+            print(f"{name:<{width}} {len(csv_bytes) / 1024:>8.1f}K "
+                  f"{len(gzip.compress(csv_bytes)) / 1024:>8.1f}K {len(bin_bytes) / 1024:>8.1f}K "
+                  f"{len(gzip.compress(bin_bytes)) / 1024:>8.1f}K "
+                  f"{csv_time * 1000:>9.2f}ms {bin_time * 1000:>9.2f}ms")
+    if converted:
+        print("* no bundle next to the CSV; measured a temporary one converted from the CSV")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare CSV datasets with their binary bundles (size and decode time).")
+    parser.add_argument('csv', nargs='+',
+                        help="CSV files to compare with the .bin bundle next to each (read-only)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report(args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,10 @@
-import json
+from geojson_stream import iter_features
 
 input_path = "src/GazaMap/Damage_Sites_GazaStrip_20251011.geojson"  # or your full file path
 
-with open(input_path, "r", encoding="utf-8") as f:
-    gj = json.load(f)
-
-for i, feat in enumerate(gj.get("features", [])):
-    print(f"Feature {i} property keys:", list(feat.get("properties", {}).keys()))
-    if i >= 1:  # print first 10 features only
-        break
\ No newline at end of file
+# iter_features decodes one feature at a time, so breaking out of the loop
+# stops reading the file after the features printed here
+for i, (_, _, props) in enumerate(iter_features(input_path, properties=None)):
+    print(f"Feature {i} property keys:", list(props.keys()))
+    if i >= 1:  # print the first 2 features only
+        break
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Persistent damage-cluster state for incremental refreshes.
+
+The state file (.npz) keeps every clustered point ordered by cluster, so the
+members of a cluster are one contiguous id range, together with each
+cluster's running Mercator sums, the point dedup keys and a sorted cell
+index of the cluster centroids. When a new UNOSAT assessment arrives, only
+the added and removed points are processed: removed points leave their
+clusters, added points join the nearest cluster within eps or form new
+clusters, and the overlap merge runs around the changed clusters only.
+
+Unchanged clusters stay in the state arrays. Cluster objects are only built
+for the clusters the delta touches, which are found through the cell index
+of the cells around the changed clusters.
+
+Usage:
+  python script/damage_sites_to_clusters.py --state clusters_state.npz            # full run, save state
+  python script/damage_sites_to_clusters.py --state clusters_state.npz --update   # apply a new assessment
+"""
+
+import heapq
+import math
+
+import numpy as np
+
+from damage_sites_to_clusters import (BUILDING_SIZE, DEDUP_TOLERANCE, Cluster, cluster_feature,
+                                      cluster_points, quantize_points, _merc_arrays)
+
+STATE_VERSION = 3
+
+# Keeps the packed cell keys positive and ordered by (gx, gy) for negative
+# cells too, within int64
+_CELL_OFFSET = 1 << 30
+
+
+def point_keys(points_ll, tolerance_m=DEDUP_TOLERANCE):
+    """Dedup grid keys of the points packed into one int64 (tolerance >= 1 cm)."""
+    lon_q, lat_q = quantize_points(points_ll, tolerance_m)
+    return (lon_q << 32) | (lat_q & 0xFFFFFFFF)
+
+
+def _contains(sorted_keys, keys):
+    """Vectorized membership test against a sorted key array."""
+    pos = np.searchsorted(sorted_keys, keys)
+    pos[pos == len(sorted_keys)] = 0
+    return (sorted_keys[pos] == keys) if len(sorted_keys) else np.zeros(len(keys), dtype=bool)
+
+
+def _cell_key(gx, gy):
+    return ((gx + _CELL_OFFSET) << 32) | (gy + _CELL_OFFSET)
+
+
+def _state_arrays(lonlat, counts, sums, eps_m, tolerance_m, keys=None):
+    """State dict of clusters whose points are consecutive ranges of lonlat."""
+    counts = np.asarray(counts, dtype=np.int64)
+    sums = np.asarray(sums, dtype=np.float64).reshape(-1, 2)
+    gx = np.floor_divide(sums[:, 0] / counts, eps_m).astype(np.int64)
+    gy = np.floor_divide(sums[:, 1] / counts, eps_m).astype(np.int64)
+    cells = _cell_key(gx, gy)
+    cell_order = np.argsort(cells, kind='stable')
+    return {
+        'version': np.array(STATE_VERSION),
+        'eps': np.array(eps_m, dtype=np.float64),
+        'tolerance': np.array(tolerance_m, dtype=np.float64),
+        'lonlat': lonlat,
+        'keys': point_keys(lonlat, tolerance_m) if keys is None else keys,
+        'starts': (np.cumsum(counts) - counts).astype(np.int64),
+        'counts': counts,
+        'sums': sums,
+        'cells': cells[cell_order],
+        'cell_order': cell_order,
+    }
+
+
+def write_state(path, state):
+    """Write a state dict as built by save_state or update_clusters."""
+    np.savez_compressed(path, **state)
+    print(f"  ✓ Saved cluster state ({len(state['counts'])} clusters, "
+          f"{len(state['lonlat'])} points) -> {path}")
+
+
+def save_state(path, clusters, points_ll, eps_m, tolerance_m=DEDUP_TOLERANCE):
+    """Write clusters and their points, one contiguous range per cluster."""
+    coords = np.asarray(points_ll, dtype=np.float64).reshape(-1, 2)
+    members = [np.asarray(c.indices, dtype=np.int64) for c in clusters]
+    order = np.concatenate(members) if members else np.empty(0, dtype=np.int64)
+    state = _state_arrays(coords[order], [len(m) for m in members],
+                          [(c.sum_x, c.sum_y) for c in clusters], eps_m, tolerance_m)
+    write_state(path, state)
+
+
+def load_state(path):
+    """Read a state file as a dict of arrays."""
+    with np.load(path) as data:
+        state = {name: data[name] for name in data.files}
+    version = int(state['version'])
+    if version == 2:
+        # Version 2 had no centroid cell index; build it once here
+        return _state_arrays(state['lonlat'], state['counts'], state['sums'],
+                             float(state['eps']), float(state['tolerance']), keys=state['keys'])
+    if version != STATE_VERSION:
+        raise SystemExit(f"Unsupported cluster state version in {path}")
+    return state
+
+
+def state_features(state, precision=None):
+    """GeoJSON Point features of the clusters in a state dict."""
+    return [cluster_feature(count, sum_x / count, sum_y / count, precision)
+            for count, (sum_x, sum_y) in zip(state['counts'].tolist(), state['sums'].tolist())]
+
+
+class _CentroidIndex:
+    """Grid of cluster centroids: the saved sorted cells plus the clusters moved since.
+
+    Saved entries of clusters that moved or died are left in place, so
+    lookups return candidates that callers check against the current
+    centroids.
+    """
+
+    def __init__(self, cells, cell_order, cell):
+        self.cells = cells
+        self.cell_order = cell_order
+        self.cell = cell
+        self.moved = {}
+
+    def add(self, slot, x, y):
+        self.moved.setdefault((int(x // self.cell), int(y // self.cell)), []).append(slot)
+
+    def near(self, x, y, reach):
+        """Slots registered in the cells within reach of (x, y)."""
+        cell = self.cell
+        gx0, gx1 = int((x - reach) // cell), int((x + reach) // cell)
+        gy0, gy1 = int((y - reach) // cell), int((y + reach) // cell)
+        # One key range per grid column of the window
+        gx = np.arange(gx0, gx1 + 1, dtype=np.int64)
+        lo = np.searchsorted(self.cells, _cell_key(gx, gy0), side='left')
+        hi = np.searchsorted(self.cells, _cell_key(gx, gy1), side='right')
+        found = set()
+        for a, b in zip(lo.tolist(), hi.tolist()):
+            if a < b:
+                found.update(self.cell_order[a:b].tolist())
+        if len(self.moved) < (gx1 - gx0 + 1) * (gy1 - gy0 + 1):
+            for (mx, my), slots in self.moved.items():
+                if gx0 <= mx <= gx1 and gy0 <= my <= gy1:
+                    found.update(slots)
+        else:
+            for mx in range(gx0, gx1 + 1):
+                for my in range(gy0, gy1 + 1):
+                    found.update(self.moved.get((mx, my), ()))
+        return found
+
+
+def update_clusters(state, points_ll, engine='python'):
+    """Apply a new point set to a saved state and return the updated state.
+
+    Clusters keep their order: surviving old clusters first, then the new
+    ones. Clusters without removed or added points, and not merged with a
+    changed one, are carried over from the state arrays as they are.
+    """
+    eps_m = float(state['eps'])
+    tolerance_m = float(state['tolerance'])
+    old_ll = state['lonlat']
+    old_keys = state['keys']
+    starts, counts, sums = state['starts'], state['counts'], state['sums']
+
+    new_ll = np.asarray(points_ll, dtype=np.float64).reshape(-1, 2)
+    new_keys = point_keys(new_ll, tolerance_m)
+    # First occurrence of every key, in input order
+    order = np.argsort(new_keys, kind='stable')
+    sorted_keys = new_keys[order]
+    is_first = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+    first = np.sort(order[is_first])
+
+    removed = ~_contains(sorted_keys[is_first], old_keys)
+    added_first = first[~_contains(np.sort(old_keys), new_keys[first])]
+    added = new_ll[added_first]
+    print(f"  Delta: {int(removed.sum())} removed, {len(added)} added, "
+          f"{int((~removed).sum())} unchanged points")
+
+    # Kept old points keep their order, added points go after them. The
+    # arrays are shared by all clusters and only read for changed ones.
+    new_index = np.cumsum(~removed) - 1
+    points_out = np.concatenate((old_ll[~removed], added))
+    keys_out = np.concatenate((old_keys[~removed], new_keys[added_first]))
+    xs, ys = _merc_arrays(points_out)
+    pts_merc = np.column_stack((xs, ys))
+
+    # Centroids and radii of the saved clusters; `live` holds Cluster
+    # objects for the clusters the delta touches, keyed by slot
+    n_old = len(starts)
+    cx = sums[:, 0] / counts
+    cy = sums[:, 1] / counts
+    radius = np.sqrt(counts) * BUILDING_SIZE
+    r_max = float(radius.max()) if n_old else 0.0
+    index = _CentroidIndex(state['cells'], state['cell_order'], eps_m)
+    live = {}
+    dead = set()
+    dirty = []
+
+    def shape(k):
+        cluster = live.get(k)
+        if cluster is not None:
+            return cluster.cx, cluster.cy, cluster.radius
+        return float(cx[k]), float(cy[k]), float(radius[k])
+
+    def materialize(k):
+        if k not in live:
+            lo = int(starts[k])
+            ids = new_index[lo:lo + int(counts[k])].tolist()
+            live[k] = Cluster(ids, pts_merc, points_out, sums=tuple(sums[k]))
+        return live[k]
+
+    removed_per_cluster = np.add.reduceat(removed.astype(np.int64), starts) if n_old else np.empty(0)
+    for k in np.flatnonzero(removed_per_cluster).tolist():
+        lo, hi = int(starts[k]), int(starts[k] + counts[k])
+        keep = ~removed[lo:hi]
+        if not keep.any():
+            dead.add(k)
+            continue
+        cluster = Cluster(new_index[lo:hi][keep].tolist(), pts_merc, points_out)
+        live[k] = cluster
+        index.add(k, cluster.cx, cluster.cy)
+        dirty.append(k)
+
+    n_slots = n_old
+    if len(added):
+        offset = len(points_out) - len(added)
+        # Owners are chosen against the centroids before any point joins,
+        # ties going to the lower cluster so results are deterministic
+        eps2 = eps_m * eps_m
+        owners = []
+        for x, y in zip(xs[offset:].tolist(), ys[offset:].tolist()):
+            best = (float('inf'), -1)
+            for k in index.near(x, y, eps_m):
+                if k in dead:
+                    continue
+                kx, ky, _ = shape(k)
+                d2 = (kx - x) ** 2 + (ky - y) ** 2
+                if d2 <= eps2 and (d2, k) < best:
+                    best = (d2, k)
+            owners.append(best[1])
+
+        leftover = []
+        grown = set()
+        for i, k in enumerate(owners):
+            if k < 0:
+                leftover.append(offset + i)
+                continue
+            materialize(k).merge(Cluster([offset + i], pts_merc, points_out))
+            grown.add(k)
+        for k in sorted(grown):
+            index.add(k, live[k].cx, live[k].cy)
+            dirty.append(k)
+
+        if leftover:
+            for c in cluster_points(points_out[leftover].tolist(), eps_m, engine=engine):
+                cluster = Cluster([leftover[i] for i in c.indices], pts_merc, points_out)
+                live[n_slots] = cluster
+                index.add(n_slots, cluster.cx, cluster.cy)
+                dirty.append(n_slots)
+                n_slots += 1
+        print(f"  {len(added) - len(leftover)} added points joined existing clusters, "
+              f"{len(leftover)} formed new ones")
+
+    # The saved clusters are overlap-free, so every overlap involves a
+    # cluster that changed. The lower slot absorbs the higher one, and the
+    # survivor is checked again because it moved and grew.
+    heap = sorted(set(dirty))
+    print(f"Merging overlaps around {len(heap)} changed clusters...")
+    r_max = max([r_max] + [live[k].radius for k in heap])
+    merges = 0
+    while heap:
+        k = heapq.heappop(heap)
+        if k in dead:
+            continue
+        x, y, r = shape(k)
+        hits = []
+        for j in index.near(x, y, r + r_max):
+            if j == k or j in dead:
+                continue
+            jx, jy, jr = shape(j)
+            if math.sqrt((jx - x) ** 2 + (jy - y) ** 2) < r + jr:
+                hits.append(j)
+        if not hits:
+            continue
+        a, b = sorted((k, min(hits)))
+        survivor = materialize(a)
+        survivor.merge(materialize(b))
+        dead.add(b)
+        index.add(a, survivor.cx, survivor.cy)
+        r_max = max(r_max, survivor.radius)
+        heapq.heappush(heap, a)
+        merges += 1
+    print(f"  {merges} merges, {len(live) - len(dead & live.keys())} clusters rebuilt")
+
+    # Assemble the new state: carried clusters are ranges of points_out,
+    # rebuilt ones are filled in from their member indices
+    slot_counts = np.concatenate((counts, np.zeros(n_slots - n_old, dtype=np.int64)))
+    slot_sums = np.concatenate((sums, np.zeros((n_slots - n_old, 2))))
+    # First point of each saved cluster in points_out; only read for the
+    # carried clusters, which lost no points
+    src = np.concatenate((new_index[starts], np.zeros(n_slots - n_old, dtype=np.int64)))
+    for k, cluster in live.items():
+        slot_counts[k] = cluster.count
+        slot_sums[k] = (cluster.sum_x, cluster.sum_y)
+    alive = np.ones(n_slots, dtype=bool)
+    alive[list(dead)] = False
+    slots = np.flatnonzero(alive)
+    lengths = slot_counts[slots]
+    seg = np.cumsum(lengths) - lengths
+    gather = np.repeat(src[slots] - seg, lengths) + np.arange(int(lengths.sum()))
+    for k, cluster in live.items():
+        if alive[k]:
+            lo = int(seg[np.searchsorted(slots, k)])
+            gather[lo:lo + cluster.count] = cluster.indices
+    return _state_arrays(points_out[gather], lengths, slot_sums[slots], eps_m, tolerance_m,
+                         keys=keys_out[gather])
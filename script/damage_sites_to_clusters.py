@@ -4,17 +4,36 @@ Cluster damage sites within 500m and iteratively merge overlapping clusters.
 Output cluster centroids as Points with proper radii.
 
 Usage:
-  python damage_sites_to_clusters.py --input input.geojson --output output.geojson --eps 500
+  python damage_sites_to_clusters.py --input input.geojson --output output.geojson --eps 500 [--engine numpy]
+  python damage_sites_to_clusters.py --input damage.gdb --layer <layer> --date-field <field> --since 2025-01-01
+  python damage_sites_to_clusters.py --pyramid 50 100 250 500 1000 --output-dir src/GazaMap
 """
 
 import json
 import math
+import heapq
 import argparse
+import statistics
+from array import array
 from collections import defaultdict
+from pathlib import Path
+
+from geojson_stream import iter_points
 
 R = 6378137.0  # Web Mercator radius
 BUILDING_SIZE = 10.0  # meters per point (small to allow proper scaling)
 
+# --- DEFAULT INPUTS ---
+PROJECT_ROOT = Path(__file__).parent.parent
+INPUT_PATH = PROJECT_ROOT / 'src' / 'GazaMap' / 'UNOSAT_GazaStrip_CDA_11October2025.gdb'  # or a Point GeoJSON
+OUTPUT_PATH = PROJECT_ROOT / 'src' / 'GazaMap' / 'Damage_Sites_clusters_500m.geojson'
+# Pyramid levels are <prefix>_<eps>m.geojson, distinct from the single-eps OUTPUT_PATH:
+# coarser levels are derived from finer ones and differ from a direct run
+PYRAMID_PREFIX = 'Damage_Sites_pyramid'
+EPS = 500.0  # meters
+DEDUP_TOLERANCE = 0.1  # meters; points on the same grid cell count as duplicates
+METERS_PER_DEGREE = 111320.0  # one degree of latitude
+
 def lonlat_to_merc(lon, lat):
     lon_rad = math.radians(lon)
     lat_rad = math.radians(lat)
@@ -27,10 +46,61 @@ def merc_to_lonlat(x, y):
     lat = (2.0 * math.atan(math.exp(y / R)) - math.pi / 2.0) * 180.0 / math.pi
     return lon, lat
 
-def cluster_points(points_ll, eps_m):
+def quantize_points(points_ll, tolerance_m=DEDUP_TOLERANCE):
+    """Snap lon/lat to a grid of tolerance_m (in degrees of latitude) as int64 keys.
+
+    The same degree step is used for longitude, so cells are never wider
+    than tolerance_m in either direction.
+    """
+    import numpy as np
+
+    coords = np.asarray(points_ll, dtype=np.float64).reshape(-1, 2)
+    step = tolerance_m / METERS_PER_DEGREE
+    keys = np.round(coords / step).astype(np.int64)
+    return keys[:, 0], keys[:, 1]
+
+def dedup_points(points_ll, tolerance_m=DEDUP_TOLERANCE):
+    """Drop points sharing a grid cell with an earlier point.
+
+    Returns an (n, 2) array of the first point of every cell, in input order.
+    """
+    import numpy as np
+
+    coords = np.asarray(points_ll, dtype=np.float64).reshape(-1, 2)
+    if len(coords) == 0:
+        return coords
+    lon_q, lat_q = quantize_points(coords, tolerance_m)
+    # lexsort is stable, so the first occurrence leads every run of equal keys
+    order = np.lexsort((lat_q, lon_q))
+    lon_s, lat_s = lon_q[order], lat_q[order]
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = (lon_s[1:] != lon_s[:-1]) | (lat_s[1:] != lat_s[:-1])
+    return coords[np.sort(order[is_first])]
+
+def dedup_report(points_ll, tolerances):
+    """Print how many points each dedup tolerance would collapse."""
+    n = len(points_ll)
+    for tolerance_m in sorted(tolerances):
+        kept = len(dedup_points(points_ll, tolerance_m))
+        print(f"  tolerance {tolerance_m:g}m: {n - kept} of {n} points collapsed, {kept} kept")
+
+def cluster_points(points_ll, eps_m, engine='python', workers=1):
     """Cluster points within eps_m radius using fixed-seed grid method.
     Returns list of Cluster objects.
+
+    engine selects the pure Python implementation ('python') or the
+    vectorized NumPy one ('numpy'); both give the same cluster membership.
+    With workers > 1 the NumPy engine runs on spatial tiles in a process
+    pool, still giving the same clusters as the NumPy engine.
     """
+    if workers > 1:
+        from tiled_clusters import cluster_points_tiled
+        return cluster_points_tiled(points_ll, eps_m, workers=workers)
+    if engine == 'numpy':
+        return _cluster_points_numpy(points_ll, eps_m)
+    if engine != 'python':
+        raise ValueError(f"Unknown clustering engine: {engine}")
+
     pts_merc = [lonlat_to_merc(lon, lat) for lon, lat in points_ll]
     n = len(points_ll)
     assigned = [False] * n
@@ -74,139 +144,502 @@ def cluster_points(points_ll, eps_m):
 
     return clusters
 
+def _merc_arrays(points_ll):
+    """Project lon/lat points to Web Mercator x and y arrays."""
+    import numpy as np
+
+    coords = np.asarray(points_ll, dtype=np.float64).reshape(-1, 2)
+    xs = R * np.radians(coords[:, 0])
+    ys = R * np.log(np.tan(np.pi / 4.0 + np.radians(coords[:, 1]) / 2.0))
+    return xs, ys
+
+class _CellIndex:
+    """Points sorted by grid cell id, so each cell is a contiguous slice."""
+
+    def __init__(self, xs, ys, cell):
+        import numpy as np
+
+        gx = np.floor_divide(xs, cell).astype(np.int64)
+        gy = np.floor_divide(ys, cell).astype(np.int64)
+        # One padding cell on each side so neighbour ids never wrap around
+        gx -= gx.min() - 1
+        gy -= gy.min() - 1
+        ny = int(gy.max()) + 2
+        self.gx = gx
+        self.gy = gy
+        self.cell_ids = gx * ny + gy
+        self.order = np.argsort(self.cell_ids, kind='stable')
+        self.sorted_ids = self.cell_ids[self.order]
+        # Neighbour cells in the same (nx, ny) order as the Python engine
+        self.offsets = np.array([dx * ny + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1)],
+                                dtype=np.int64)
+
+    def neighbors(self, i):
+        """Indices of the points in the 3x3 cells around point i."""
+        import numpy as np
+
+        neighbor_ids = self.cell_ids[i] + self.offsets
+        starts = np.searchsorted(self.sorted_ids, neighbor_ids, side='left')
+        stops = np.searchsorted(self.sorted_ids, neighbor_ids, side='right')
+        return np.concatenate([self.order[a:b] for a, b in zip(starts, stops)])
+
+def _seed_owners(xs, ys, eps_m, index=None):
+    """Run the fixed-seed sweep and return the seed index owning each point."""
+    import numpy as np
+
+    n = len(xs)
+    if index is None:
+        index = _CellIndex(xs, ys, eps_m)
+    owner = np.empty(n, dtype=np.int64)
+    free = np.ones(n, dtype=bool)
+    eps2 = eps_m * eps_m
+
+    i = 0
+    while i < n:
+        if not free[i]:
+            # argmax stops at the first free point
+            i += int(np.argmax(free[i:]))
+            if not free[i]:
+                break
+        free[i] = False
+        owner[i] = i
+
+        candidates = index.neighbors(i)
+        candidates = candidates[free[candidates]]
+        dx = xs[candidates] - xs[i]
+        dy = ys[candidates] - ys[i]
+        members = candidates[dx * dx + dy * dy <= eps2]
+        free[members] = False
+        owner[members] = i
+        i += 1
+
+    return owner
+
+def _clusters_from_owners(xs, ys, owner, index, points_ll):
+    """Build Cluster objects from an owner array.
+
+    Members are ordered as the sweep visits them (seed first, then by
+    neighbour cell and index) and summed left to right in that order
+    (np.cumsum, not the pairwise np.sum), the same order as the Python
+    engine. The sums can still differ from it in the last bits because the
+    vectorized Mercator projection may round a y coordinate one ulp apart
+    from math.log / math.tan.
+    """
+    import numpy as np
+
+    pts_merc = list(zip(xs.tolist(), ys.tolist()))
+    idx = np.arange(len(owner))
+    rank = (index.gx - index.gx[owner] + 1) * 3 + (index.gy - index.gy[owner] + 1)
+    not_seed = owner != idx
+    ordered = np.lexsort((idx, rank, not_seed, owner))
+    seeds = ordered[~not_seed[ordered]]
+    bounds = np.searchsorted(owner[ordered], seeds, side='left').tolist() + [len(ordered)]
+
+    clusters = []
+    for k, seed in enumerate(seeds.tolist()):
+        members = ordered[bounds[k]:bounds[k + 1]]
+        sums = (np.cumsum(xs[members])[-1], np.cumsum(ys[members])[-1])
+        clusters.append(Cluster(members.tolist(), pts_merc, points_ll, sums=sums))
+    return clusters
+
+def _cluster_points_numpy(points_ll, eps_m):
+    """NumPy version of cluster_points.
+
+    Points are projected in bulk and sorted by grid cell id, so the points of
+    a cell are a contiguous slice found with searchsorted. Seeds are visited
+    in the same order and neighbour cells in the same order as the Python
+    engine, which keeps the clusters and their member order identical
+    (centroid sums agree to within float rounding of the projection).
+    """
+    xs, ys = _merc_arrays(points_ll)
+    if len(xs) == 0:
+        return []
+    index = _CellIndex(xs, ys, eps_m)
+    owner = _seed_owners(xs, ys, eps_m, index)
+    return _clusters_from_owners(xs, ys, owner, index, points_ll)
+
 class Cluster:
-    def __init__(self, point_indices, points_merc, points_ll):
-        self.indices = point_indices
-        self.points_merc = [points_merc[i] for i in point_indices]
-        self.points_ll = [points_ll[i] for i in point_indices]
+    """Circle around a group of damage points.
+
+    Only the running coordinate sums and the count are kept, so merging is
+    O(1) in the number of points. Member indices are stored as array-backed
+    blocks and point coordinates are looked up lazily in the shared point
+    lists when a caller asks for them.
+    """
+    __slots__ = ('_blocks', '_points_merc', '_points_ll', 'count',
+                 'sum_x', 'sum_y', 'cx', 'cy', 'radius', 'area')
+
+    def __init__(self, point_indices, points_merc, points_ll, sums=None):
+        self._blocks = [array('q', point_indices)]
+        self._points_merc = points_merc
+        self._points_ll = points_ll
         self.count = len(point_indices)
-        
+
+        if sums is None:
+            sum_x = sum_y = 0.0
+            for i in point_indices:
+                x, y = points_merc[i]
+                sum_x += x
+                sum_y += y
+            sums = (sum_x, sum_y)
+        self.sum_x, self.sum_y = float(sums[0]), float(sums[1])
+        self._update_shape()
+
+    def _update_shape(self):
         # Calculate centroid in Mercator
-        self.cx = sum(p[0] for p in self.points_merc) / self.count
-        self.cy = sum(p[1] for p in self.points_merc) / self.count
-        
+        self.cx = self.sum_x / self.count
+        self.cy = self.sum_y / self.count
+
         # Calculate radius based on sqrt(count) * 10m (no cap for proper proportions)
         self.radius = math.sqrt(self.count) * BUILDING_SIZE
         self.area = math.pi * (self.radius ** 2)
-    
+
+    @property
+    def indices(self):
+        """Indices of the member points, in merge order."""
+        return [i for block in self._blocks for i in block]
+
+    @property
+    def points_merc(self):
+        return [self._points_merc[i] for i in self.indices]
+
+    @property
+    def points_ll(self):
+        return [self._points_ll[i] for i in self.indices]
+
     def overlaps(self, other):
         """Check if this cluster's circle overlaps with another."""
         dx = self.cx - other.cx
         dy = self.cy - other.cy
         dist = math.sqrt(dx * dx + dy * dy)
         return dist < (self.radius + other.radius)
-    
+
     def merge(self, other):
         """Merge another cluster into this one."""
-        self.indices.extend(other.indices)
-        self.points_merc.extend(other.points_merc)
-        self.points_ll.extend(other.points_ll)
-        self.count = len(self.indices)
-        
-        # Recalculate centroid
-        self.cx = sum(p[0] for p in self.points_merc) / self.count
-        self.cy = sum(p[1] for p in self.points_merc) / self.count
-        
-        # Recalculate radius
-        self.radius = math.sqrt(self.count) * BUILDING_SIZE
-        self.area = math.pi * (self.radius ** 2)
-    
-    def to_geojson_feature(self):
-        """Convert to GeoJSON Point feature."""
-        clon, clat = merc_to_lonlat(self.cx, self.cy)
-        return {
-            'type': 'Feature',
-            'properties': {
-                'count': self.count,
-                'radius': round(self.radius, 2),
-                'area_m2': round(self.area, 2),
-                'area_ha': round(self.area / 10000, 2)
-            },
-            'geometry': {
-                'type': 'Point',
-                'coordinates': [clon, clat]
-            }
+        self._blocks.extend(other._blocks)
+        self.count += other.count
+        self.sum_x += other.sum_x
+        self.sum_y += other.sum_y
+        self._update_shape()
+
+    def copy(self):
+        """Return an independent cluster that can be merged without touching this one."""
+        other = Cluster.__new__(Cluster)
+        for name in Cluster.__slots__:
+            setattr(other, name, getattr(self, name))
+        other._blocks = list(self._blocks)
+        return other
+
+    def to_geojson_feature(self, precision=None):
+        """Convert to GeoJSON Point feature.
+
+        precision rounds the centroid coordinates to that many decimals.
+        """
+        return cluster_feature(self.count, self.cx, self.cy, precision)
+
+def cluster_feature(count, cx, cy, precision=None):
+    """GeoJSON Point feature of a cluster of count points centred at (cx, cy) in Mercator."""
+    radius = math.sqrt(count) * BUILDING_SIZE
+    area = math.pi * (radius ** 2)
+    clon, clat = merc_to_lonlat(cx, cy)
+    if precision is not None:
+        clon, clat = round(clon, precision), round(clat, precision)
+    return {
+        'type': 'Feature',
+        'properties': {
+            'count': count,
+            'radius': round(radius, 2),
+            'area_m2': round(area, 2),
+            'area_ha': round(area / 10000, 2)
+        },
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [clon, clat]
         }
+    }
+
+def _grid_cells(cx, cy, radius, cell):
+    """Yield the grid cells covered by the bounding box of a circle."""
+    gx0 = int((cx - radius) // cell)
+    gx1 = int((cx + radius) // cell)
+    gy0 = int((cy - radius) // cell)
+    gy1 = int((cy + radius) // cell)
+    for gx in range(gx0, gx1 + 1):
+        for gy in range(gy0, gy1 + 1):
+            yield (gx, gy)
+
+def _merge_pass(clusters, cell):
+    """Run one merge pass using a grid index keyed on cluster radius.
+
+    Equivalent to comparing every cluster with every later one: each cluster
+    is registered in all cells its circle's bounding box covers, so any two
+    overlapping circles share at least one cell. Candidates are visited in
+    ascending index order through a heap, and the index is re-queried after
+    every merge because the absorbing cluster moves and grows.
+    """
+    grid = defaultdict(list)
+    for idx, cluster in enumerate(clusters):
+        for key in _grid_cells(cluster.cx, cluster.cy, cluster.radius, cell):
+            grid[key].append(idx)
+
+    merged_mask = [False] * len(clusters)
+    new_clusters = []
+    merged_any = False
+
+    for i in range(len(clusters)):
+        if merged_mask[i]:
+            continue
+
+        current = clusters[i]
+        pointer = i
+        seen = {i}
+        heap = []
+
+        def collect():
+            for key in _grid_cells(current.cx, current.cy, current.radius, cell):
+                for j in grid.get(key, ()):
+                    if j > pointer and j not in seen:
+                        seen.add(j)
+                        heapq.heappush(heap, j)
+
+        collect()
+        while heap:
+            pointer = heapq.heappop(heap)
+            if merged_mask[pointer]:
+                continue
+            if current.overlaps(clusters[pointer]):
+                current.merge(clusters[pointer])
+                merged_mask[pointer] = True
+                merged_any = True
+                collect()
+
+        new_clusters.append(current)
+
+    return new_clusters, merged_any
+
+def merge_overlapping_clusters(clusters, cell_size=None):
+    """Iteratively merge overlapping clusters until no more overlaps exist.
+
+    Each pass gives the same result as the pairwise scan over all clusters,
+    so the fixed point is unchanged, but overlap candidates come from a
+    spatial grid instead of an O(n^2) comparison. Passes are cheap enough to
+    run until convergence, so there is no iteration cap.
+    """
+    if not clusters:
+        return clusters
+
+    if cell_size is None:
+        # Cell of about one typical cluster diameter: small clusters touch a
+        # handful of cells, large ones are still found through every cell.
+        cell_size = max(2.0 * statistics.median(c.radius for c in clusters), BUILDING_SIZE)
 
-def merge_overlapping_clusters(clusters):
-    """Iteratively merge overlapping clusters until no more overlaps exist."""
     iteration = 0
     while True:
         iteration += 1
-        merged_any = False
-        new_clusters = []
-        merged_mask = [False] * len(clusters)
-        
-        for i in range(len(clusters)):
-            if merged_mask[i]:
-                continue
-            
-            current = clusters[i]
-            # Check for overlaps with remaining clusters
-            for j in range(i + 1, len(clusters)):
-                if merged_mask[j]:
-                    continue
-                if current.overlaps(clusters[j]):
-                    current.merge(clusters[j])
-                    merged_mask[j] = True
-                    merged_any = True
-            
-            new_clusters.append(current)
-        
+        new_clusters, merged_any = _merge_pass(clusters, cell_size)
+
         print(f"  Iteration {iteration}: {len(clusters)} -> {len(new_clusters)} clusters")
-        
-        if not merged_any:
-            break
-        
+
         clusters = new_clusters
-        
-        # Safety limit
-        if iteration > 100:
-            print("  Warning: Max iterations reached")
+        if not merged_any:
             break
-    
+
     return clusters
 
-def main():
+def coarsen_clusters(clusters, eps_m, engine='python'):
+    """Build the next pyramid level by grouping existing clusters.
 
-    # --- HARDCODED INPUTS ---
-    INPUT_PATH = r'C:\Users\mfmat\Documents\Magistrale\SecondoAnno\DV\Data-Visualization-Project\src\GazaMap\Damage_Sites_GazaStrip_20251011_slim.geojson'  # Change as needed
-    OUTPUT_PATH = r'C:\Users\mfmat\Documents\Magistrale\SecondoAnno\DV\Data-Visualization-Project\src\GazaMap\Damage_Sites_clusters_500m.geojson'
-    EPS = 500.0  # meters
+    Cluster centroids are clustered with the coarser eps_m and every group is
+    combined from its child clusters' running sums, so raw points are never
+    revisited. Overlaps between the new clusters are then merged as usual.
+    """
+    centroids = [merc_to_lonlat(c.cx, c.cy) for c in clusters]
+    parents = []
+    for group in cluster_points(centroids, eps_m, engine=engine):
+        children = group.indices
+        parent = clusters[children[0]].copy()
+        for j in children[1:]:
+            parent.merge(clusters[j])
+        parents.append(parent)
+    return merge_overlapping_clusters(parents)
 
-    print(f"Loading {INPUT_PATH}...")
-    with open(INPUT_PATH, 'r', encoding='utf-8') as f:
-        gj = json.load(f)
+def build_pyramid(points_ll, levels, engine='python', workers=1):
+    """Cluster points at several resolutions, finest first.
 
+    Only the finest level is computed from the raw points; every other level
+    is derived from the one below it. Returns a list of (eps, clusters).
+    """
+    levels = sorted(levels)
+    print(f"Building cluster pyramid for eps={levels}...")
+    pyramid = []
+    clusters = None
+    for eps in levels:
+        print(f"Level {eps:g}m:")
+        if clusters is None:
+            clusters = cluster_points(points_ll, eps, engine=engine, workers=workers)
+            clusters = merge_overlapping_clusters(clusters)
+        else:
+            clusters = coarsen_clusters(clusters, eps, engine=engine)
+        print(f"  {len(clusters)} clusters")
+        pyramid.append((eps, clusters))
+    return pyramid
 
-    # Collect points and deduplicate (within 1cm)
-    points_ll_raw = []
-    for feat in gj.get('features', []):
-        geom = feat.get('geometry')
-        if not geom:
-            continue
-        if geom.get('type') == 'Point':
-            lon, lat = geom['coordinates'][:2]
-            points_ll_raw.append((float(lon), float(lat)))
-
-    # Deduplicate points (round to 5 decimal places ~1m, or 6 for ~10cm)
-    seen = set()
-    points_ll = []
-    for lon, lat in points_ll_raw:
-        key = (round(lon, 6), round(lat, 6))
-        if key not in seen:
-            seen.add(key)
-            points_ll.append((lon, lat))
+def write_clusters(clusters, path, precision=None):
+    """Write clusters as a compact FeatureCollection of Points."""
+    write_features([cluster.to_geojson_feature(precision) for cluster in clusters], path)
+
+def write_features(features, path):
+    """Write cluster features as a compact FeatureCollection."""
+    out = {
+        'type': 'FeatureCollection',
+        'features': features
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(out, f, separators=(',', ':'))
+
+def save_pyramid(pyramid, output_dir, source, precision=6):
+    """Write one file per pyramid level plus a manifest describing them."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    levels = []
+    for eps, clusters in pyramid:
+        name = f"{PYRAMID_PREFIX}_{eps:g}m.geojson"
+        write_clusters(clusters, output_dir / name, precision)
+        levels.append({
+            'eps_m': eps,
+            'file': name,
+            'clusters': len(clusters),
+            'points': sum(c.count for c in clusters),
+            'max_radius_m': round(max((c.radius for c in clusters), default=0.0), 2),
+            'bytes': (output_dir / name).stat().st_size,
+        })
+        print(f"  ✓ Saved level {eps:g}m: {len(clusters)} clusters -> {output_dir / name}")
+
+    manifest_path = output_dir / f'{PYRAMID_PREFIX}_manifest.json'
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': Path(source).name, 'levels': levels}, f, indent=2)
+    print(f"  ✓ Saved manifest -> {manifest_path}")
+
+def _iso_date(value):
+    import datetime
+
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a date as YYYY-MM-DD, got {value!r}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Cluster damage sites and merge overlapping clusters.')
+    parser.add_argument('--input', default=str(INPUT_PATH),
+                        help='UNOSAT FileGDB (.gdb) or GeoJSON with Point features')
+    parser.add_argument('--output', default=str(OUTPUT_PATH), help='output GeoJSON of cluster centroids')
+    parser.add_argument('--eps', type=float, default=EPS, help='clustering radius in meters')
+    parser.add_argument('--engine', choices=['numpy', 'python'], default='python',
+                        help='clustering backend (default: python)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='opt-in: cluster spatial tiles in this many processes (NumPy engine); '
+                             'not faster on a single CPU, time it with benchmark_clusters.py --workers')
+    parser.add_argument('--pyramid', type=float, nargs='+', metavar='EPS',
+                        help='build one level per eps (e.g. 50 100 250 500 1000) instead of a single output')
+    parser.add_argument('--output-dir', help='directory for pyramid levels (default: folder of --output)')
+    parser.add_argument('--state', help='cluster state file (.npz) written after clustering')
+    parser.add_argument('--update', action='store_true',
+                        help='update the clusters in --state with the points added or removed in --input')
+
+    gdb = parser.add_argument_group('FileGDB input')
+    gdb.add_argument('--layer', help='layer to read (default: first layer)')
+    gdb.add_argument('--where', help='attribute filter as an OGR SQL WHERE clause')
+    gdb.add_argument('--date-field', help='date field used by --since/--until')
+    gdb.add_argument('--since', type=_iso_date, help='keep points with date-field >= this date (YYYY-MM-DD)')
+    gdb.add_argument('--until', type=_iso_date, help='keep points with date-field <= this date (YYYY-MM-DD)')
+    parser.add_argument('--dedup-tolerance', type=float, default=DEDUP_TOLERANCE,
+                        help='points closer than this (meters, same grid cell) are duplicates')
+    parser.add_argument('--dedup-report', type=float, nargs='+', metavar='METERS',
+                        help='print how many points each tolerance would collapse')
+    gdb.add_argument('--batch-size', type=int, default=65536, help='features read per batch')
+    return parser.parse_args()
+
+def check_input(args):
+    """Exit with a clear message if the input is missing or cannot be opened."""
+    path = Path(args.input)
+    if not path.exists():
+        raise SystemExit(f"Input not found: {path}\n"
+                         f"Pass --input <damage sites .gdb or Point .geojson>.")
+    if is_gdb(args.input):
+        import pyogrio
+        from pyogrio.errors import DataSourceError
+
+        try:
+            # Metadata only; fails if a table of the geodatabase is missing
+            pyogrio.read_info(args.input, layer=args.layer)
+        except DataSourceError as e:
+            raise SystemExit(f"Cannot open FileGDB {path}: {e}\n"
+                             f"Pass --input <damage sites .gdb or Point .geojson>.")
+
+def load_points(args):
+    """Read input points as an (n, 2) array or a list of (lon, lat) tuples."""
+    if is_gdb(args.input):
+        from gdb_points import build_where, read_points
+        from layer_reader import layer_info
+
+        # The date field is checked against the layer's fields before it is quoted
+        fields = layer_info(args.input, args.layer)['fields']
+        try:
+            where = build_where(args.where, args.date_field, args.since, args.until, fields=fields)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        return read_points(args.input, layer=args.layer, where=where, batch_size=args.batch_size)
+
+    # Stream Point coordinates instead of loading the whole FeatureCollection
+    return list(iter_points(args.input))
+
+def is_gdb(path):
+    """Return True if path points to a FileGDB directory."""
+    return path.rstrip('/\\').lower().endswith('.gdb')
+
+def main():
+    args = parse_args()
+
+    check_input(args)
+    print(f"Loading {args.input}...")
+    points_ll_raw = load_points(args)
+
+    if args.dedup_report:
+        print("Deduplication report:")
+        dedup_report(points_ll_raw, args.dedup_report)
+
+    # Deduplicate points on a grid of --dedup-tolerance meters (default ~10cm)
+    points_ll = [tuple(p) for p in dedup_points(points_ll_raw, args.dedup_tolerance).tolist()]
 
     if not points_ll:
         raise SystemExit('No Point features found in input.')
 
-    print(f"Found {len(points_ll_raw)} points, {len(points_ll)} after deduplication")
+    print(f"Found {len(points_ll_raw)} points, {len(points_ll)} after deduplication "
+          f"({len(points_ll_raw) - len(points_ll)} collapsed at {args.dedup_tolerance:g}m)")
+
+    if args.update:
+        if not args.state or not Path(args.state).exists():
+            raise SystemExit('--update needs an existing --state file.')
+        from cluster_state import load_state, state_features, update_clusters, write_state
+
+        print(f"Updating clusters from {args.state}...")
+        state = update_clusters(load_state(args.state), points_ll, engine=args.engine)
+        n_clusters = len(state['counts'])
+        print(f"Final: {n_clusters} non-overlapping clusters")
+        write_features(state_features(state), args.output)
+        print(f"Saved {n_clusters} non-overlapping cluster centroids -> {args.output}")
+        write_state(args.state, state)
+        return
+
+    if args.pyramid:
+        pyramid = build_pyramid(points_ll, args.pyramid, engine=args.engine, workers=args.workers)
+        save_pyramid(pyramid, args.output_dir or Path(args.output).parent, args.input)
+        return
 
     # Initial clustering
 
-    print(f"Initial clustering with eps={EPS}m...")
-    clusters = cluster_points(points_ll, EPS)
+    print(f"Initial clustering with eps={args.eps}m ({args.engine} engine)...")
+    clusters = cluster_points(points_ll, args.eps, engine=args.engine, workers=args.workers)
     print(f"  Created {len(clusters)} initial clusters")
 
     # Merge overlapping clusters
@@ -215,18 +648,13 @@ def main():
     print(f"Final: {len(clusters)} non-overlapping clusters")
 
     # Output as FeatureCollection of Points
-    features = [cluster.to_geojson_feature() for cluster in clusters]
+    write_clusters(clusters, args.output)
 
-    out = {
-        'type': 'FeatureCollection',
-        'features': features
-    }
-
-
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(out, f, separators=(',', ':'))
+    print(f"Saved {len(clusters)} non-overlapping cluster centroids -> {args.output}")
 
-    print(f"Saved {len(clusters)} non-overlapping cluster centroids -> {OUTPUT_PATH}")
+    if args.state:
+        from cluster_state import save_state
+        save_state(args.state, clusters, points_ll, args.eps, args.dedup_tolerance)
 
 if __name__ == '__main__':
     main()
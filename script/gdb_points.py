@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Read damage-site points straight from the UNOSAT FileGDB.
+
+Point geometries are streamed from the layer in fixed-size Arrow batches and
+returned as (n, 2) lon/lat coordinate arrays, so no intermediate GeoJSON has
+to be written and parsed. Attribute and date filters are passed to the OGR
+driver as a SQL WHERE clause and applied while reading.
+
+Usage:
+  from gdb_points import iter_point_batches
+
+  for coords in iter_point_batches(UNOSAT_GDB, where="Main_Damage_Site_Class != 6"):
+      ...
+"""
+
+import datetime
+import re
+
+import numpy as np
+import pyogrio
+import shapely
+from pyproj import CRS, Transformer
+
+BATCH_SIZE = 65536  # features per batch
+
+
+def _as_date(value):
+    """A datetime.date from a date or a YYYY-MM-DD string (ValueError otherwise)."""
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value))
+
+
+def build_where(where=None, date_field=None, since=None, until=None, fields=None):
+    """Combine an attribute filter with an optional date range on date_field.
+
+    since / until are dates (or YYYY-MM-DD strings) and are written as
+    parsed ISO dates, never as the raw text. With `fields` (the layer's
+    field names) date_field must be one of them.
+    """
+    clauses = []
+    if where:
+        clauses.append(f"({where})")
+    if date_field and (since or until):
+        if fields is not None and date_field not in list(fields):
+            raise ValueError(f"Unknown date field '{date_field}'; available: {', '.join(map(str, fields))}")
+        column = '"' + date_field.replace('"', '""') + '"'
+        if since:
+            clauses.append(f"{column} >= '{_as_date(since).isoformat()}'")
+        if until:
+            clauses.append(f"{column} <= '{_as_date(until).isoformat()}'")
+    return ' AND '.join(clauses) or None
+
+
+def iter_point_batches(path, layer=None, where=None, batch_size=BATCH_SIZE):
+    """Yield (n, 2) float64 arrays of lon/lat for the Point features of a layer.
+
+    Only the geometry and the fields referenced by `where` are read (the
+    driver ignores filters on unread fields). Coordinates are reprojected to
+    WGS84 if the layer uses another CRS. Non-point geometries are skipped.
+    """
+    info = pyogrio.read_info(path, layer=layer)
+    columns = []
+    if where:
+        columns = [name for name in info['fields']
+                   if re.search(rf'\b{re.escape(name)}\b', where)]
+    transformer = None
+    if info['crs'] and CRS.from_user_input(info['crs']).to_epsg() != 4326:
+        transformer = Transformer.from_crs(info['crs'], 'EPSG:4326', always_xy=True)
+
+    with pyogrio.raw.open_arrow(path, layer=layer, columns=columns, where=where,
+                                batch_size=batch_size,
+                                use_pyarrow=True) as (meta, reader):
+        geom_col = meta['geometry_name'] or 'wkb_geometry'
+        for batch in reader:
+            geoms = shapely.from_wkb(batch.column(geom_col).to_numpy(zero_copy_only=False))
+            geoms = geoms[shapely.get_type_id(geoms) == shapely.GeometryType.POINT]
+            coords = shapely.get_coordinates(geoms)  # drops Z
+            if transformer is not None:
+                coords = np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+            if len(coords):
+                yield coords
+
+
+def read_points(path, layer=None, where=None, batch_size=BATCH_SIZE):
+    """Read all matching points of a layer as one (n, 2) lon/lat array."""
+    batches = list(iter_point_batches(path, layer=layer, where=where, batch_size=batch_size))
+    if not batches:
+        return np.empty((0, 2), dtype=np.float64)
+    return np.concatenate(batches)
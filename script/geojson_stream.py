@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Streaming reader for GeoJSON FeatureCollections.
+
+Walks the top-level object with a small incremental tokenizer and decodes the
+`features` array one feature at a time, so large damage-site layers can be
+processed in bounded memory and results start flowing before the whole file
+has been read.
+
+Usage:
+  from geojson_stream import iter_features, iter_points
+
+  for lon, lat in iter_points('Damage_Sites.geojson'):
+      ...
+"""
+
+import json
+import re
+
+CHUNK_SIZE = 1 << 20  # characters read per refill
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class _Scanner:
+    """Incremental tokenizer over a text file."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Read another chunk, dropping the part of the buffer already consumed."""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of GeoJSON input')
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, found {self.buf[self.pos]!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _select(props, properties):
+    if properties is None:
+        return props
+    return {key: props.get(key) for key in properties}
+
+
+def iter_features(path, properties=(), chunk_size=CHUNK_SIZE):
+    """Yield (geometry_type, coordinates, properties) for every feature.
+
+    properties lists the property names to keep; None keeps all of them.
+    Features without a geometry yield (None, None, properties).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        scanner = _Scanner(f, chunk_size)
+        scanner.expect('{')
+        if scanner.peek() == '}':
+            return
+        while True:
+            key = scanner.value()
+            scanner.expect(':')
+            if key == 'features':
+                scanner.expect('[')
+                if scanner.peek() != ']':
+                    while True:
+                        feat = scanner.value()
+                        geom = feat.get('geometry') or {}
+                        yield (geom.get('type'), geom.get('coordinates'),
+                               _select(feat.get('properties') or {}, properties))
+                        if scanner.peek() == ']':
+                            break
+                        scanner.expect(',')
+                scanner.expect(']')
+            else:
+                scanner.value()
+            if scanner.peek() == '}':
+                return
+            scanner.expect(',')
+
+
+def iter_points(path, chunk_size=CHUNK_SIZE):
+    """Yield (lon, lat) for every Point feature."""
+    for geom_type, coords, _ in iter_features(path, chunk_size=chunk_size):
+        if geom_type == 'Point':
+            yield float(coords[0]), float(coords[1])
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Typed, column-pruned readers for the HDX incident exports.
+
+Each source declares the columns the GeoChart preprocessing uses, their
+dtypes and date formats. Only those columns are parsed, repeated labels are
+read as categoricals and dates are parsed with an explicit format. The
+header is checked against the schema before parsing, so an upstream column
+rename fails with the missing names (and close matches) instead of a
+KeyError halfway through the pipeline.
+
+Usage:
+  from incident_sources import read_source
+
+  df = read_source('health')                    # pandas C parser
+  df = read_source('food', engine='pyarrow')     # multi-threaded pyarrow parser
+"""
+
+import csv
+import difflib
+
+import pandas as pd
+
+FOOD_CSV = 'src/Dataset/2023-2025-pse-gaza-conflict-incidents-affecting-food-systems-incident-data-incident-data.csv'
+HEALTH_CSV = 'src/Dataset/2023-2024-pse-shcc-health-care-data.csv'
+
+# Column dtypes; None keeps the parser's inference (text, counts, flags)
+SOURCES = {
+    'food': {
+        'path': FOOD_CSV,
+        'tag_row': False,
+        'dates': {'Date': '%Y-%m-%d'},
+        'columns': {
+            'Date': None,
+            'Latitude': 'float64',
+            'Longitude': 'float64',
+            'Event Public Description': None,
+            'Reported Perpetrator Name': 'category',
+            'Reported Perpetrator': 'category',
+            'Weapon Carried/Used': 'category',
+            'Food System Impact': None,
+            'All Food Security Categories': None,
+            'Admin 1': 'category',
+            'Event ID': 'int64',
+        },
+    },
+    'health': {
+        'path': HEALTH_CSV,
+        # HXL hashtag row under the header
+        'tag_row': True,
+        'dates': {'Date': '%Y-%m-%d %H:%M:%S'},
+        'columns': {
+            'Date': None,
+            'Latitude': 'float64',
+            'Longitude': 'float64',
+            'Reported Perpetrator Name': 'category',
+            'Reported Perpetrator': 'category',
+            'Weapon Carried/Used': 'category',
+            'Number of Attacks on Health Facilities Reporting Destruction': None,
+            'Number of Attacks on Health Facilities Reporting Damaged': None,
+            'Health Workers Killed': None,
+            'Health Workers Injured': None,
+            'Health Workers Kidnapped': None,
+            'Health Workers Arrested': None,
+            'Reported Health Worker Profession': None,
+            'Forceful Entry into Health Facility': None,
+            'Occupation of Health Facility': None,
+            'Vicinity of Health Facility Affected': None,
+            'Access Denied or Obstructed': None,
+            'Health Transportation Destroyed': None,
+            'Health Transportation Damaged': None,
+            'SiND Event ID': 'int64',
+        },
+    },
+}
+
+
+def check_header(name, path):
+    """Raise ValueError if the file lacks any column of the source schema."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        header = next(csv.reader(f), [])
+    missing = [col for col in SOURCES[name]['columns'] if col not in header]
+    if missing:
+        hints = []
+        for col in missing:
+            close = difflib.get_close_matches(col, header, n=1)
+            hints.append(f"'{col}'" + (f" (found '{close[0]}')" if close else ""))
+        raise ValueError(f"{path} does not match the '{name}' schema, missing columns: "
+                         + ", ".join(hints))
+
+
+def _read_pyarrow(path, schema):
+    from pyarrow import csv as pa_csv
+    import pyarrow as pa
+
+    types = {'category': pa.dictionary(pa.int32(), pa.string()),
+             'float64': pa.float64(), 'int64': pa.int64()}
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(skip_rows_after_names=1 if schema['tag_row'] else 0),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(schema['columns']),
+            column_types={col: types[dtype] for col, dtype in schema['columns'].items() if dtype},
+            # Empty cells are missing values, as with the pandas parser
+            strings_can_be_null=True,
+        ),
+    )
+    return table.to_pandas()
+
+
+def read_source(name, path=None, engine='c'):
+    """Read one incident export with its schema.
+
+    engine is 'c' (pandas) or 'pyarrow'. Date columns are returned parsed.
+    """
+    schema = SOURCES[name]
+    path = path or schema['path']
+    check_header(name, path)
+
+    if engine == 'pyarrow':
+        df = _read_pyarrow(path, schema)
+    else:
+        df = pd.read_csv(
+            path,
+            usecols=list(schema['columns']),
+            dtype={col: dtype for col, dtype in schema['columns'].items() if dtype},
+            skiprows=[1] if schema['tag_row'] else None,
+            engine=engine,
+        )
+
+    for col, fmt in schema['dates'].items():
+        df[col] = pd.to_datetime(df[col], format=fmt)
+    return df
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Layer-selective reading of FileGDB / GeoPackage / GeoJSON sources.
+
+Layers and their fields are listed from the datasource metadata without
+reading any features, and the chosen layer is read once. Column selection,
+a bounding box and an attribute filter (OGR SQL WHERE) are passed to the
+driver, so unneeded fields and features are never decoded. When pyarrow is
+installed, features are transferred through the Arrow stream interface
+instead of feature-by-feature; date fields are converted to datetime64
+there too, so both paths give the same dtypes.
+
+Layer and column names are checked against the metadata first, so a typo
+fails with the available names instead of an empty read.
+
+Usage:
+  from layer_reader import list_layers, read_layer
+
+  list_layers('src/GazaMap/GeoMap/Palestine.gdb')   # {'pse_admin0': 'MultiPolygon', ...}
+  gdf = read_layer('src/GazaMap/GeoMap/Palestine.gdb', layer='pse_admin0',
+                   columns=['adm0_name', 'adm0_pcode'], bbox=(34.2, 31.2, 34.6, 31.6))
+"""
+
+import difflib
+import importlib.util
+
+import pyogrio
+
+
+def has_arrow():
+    """Whether the Arrow fast path (pyarrow) is available."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def list_layers(path):
+    """Layer name -> geometry type, from the datasource metadata only."""
+    return {str(name): str(geometry_type) for name, geometry_type in pyogrio.list_layers(path)}
+
+
+def _unknown(kind, names, available, path):
+    hints = []
+    for name in names:
+        close = difflib.get_close_matches(name, available, n=1)
+        hints.append(f"'{name}'" + (f" (did you mean '{close[0]}'?)" if close else ""))
+    return ValueError(f"{path}: unknown {kind} {', '.join(hints)}; available: {', '.join(available)}")
+
+
+def layer_info(path, layer=None):
+    """Fields, CRS, feature count and geometry type of one layer, without reading features."""
+    if layer is not None:
+        layers = list(list_layers(path))
+        if layer not in layers:
+            raise _unknown('layer', [layer], layers, path)
+    return pyogrio.read_info(path, layer=layer)
+
+
+def read_layer(path, layer=None, columns=None, bbox=None, where=None, use_arrow=None):
+    """Read one layer as a GeoDataFrame with the filters applied by the driver.
+
+    columns limits the attribute fields read (the geometry is always read),
+    bbox is (minx, miny, maxx, maxy) in the layer's CRS and where is an OGR
+    SQL expression on the layer's fields. use_arrow defaults to True when
+    pyarrow is installed.
+    """
+    import geopandas as gpd
+
+    info = layer_info(path, layer)
+    if columns is not None:
+        fields = [str(name) for name in info['fields']]
+        missing = [col for col in columns if col not in fields]
+        if missing:
+            raise _unknown('column(s)', missing, fields, path)
+        columns = list(columns)
+    if use_arrow is None:
+        use_arrow = has_arrow()
+    # Arrow date32 fields would otherwise become datetime.date objects
+    arrow_kwargs = {'arrow_to_pandas_kwargs': {'date_as_object': False}} if use_arrow else {}
+    return gpd.read_file(path, layer=layer, columns=columns, bbox=bbox, where=where,
+                         engine='pyogrio', use_arrow=use_arrow, **arrow_kwargs)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Point-in-polygon join of incidents to the Gaza municipalities.
+
+The municipal boundary polygons are loaded once into a shapely STRtree and
+prepared. All incident points are queried against the tree's bounding boxes
+in one vectorized call and only the candidate pairs are tested against the
+prepared polygons, so tens of thousands of points are tagged in a few tens
+of milliseconds. Each incident gets the OBJECTID of the municipality it
+falls in (NO_MUNICIPALITY outside the Gaza Strip, e.g. West Bank health
+incidents); a point on a shared border goes to the lower id.
+
+Usage:
+  from municipality_join import load_municipalities, tag_municipalities, municipality_counts
+
+  municipalities = load_municipalities()
+  df['municipality_id'] = tag_municipalities(df, municipalities)
+  counts = municipality_counts(df, municipalities)
+
+  python script/municipality_join.py   # tag Combined_Incidents_GeoChart.csv and print the counts
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import shapely
+
+# Municipal boundaries of the GeoMap (also the center of its projection)
+MAP_BOUNDARIES = 'src/GazaMap/GazaStrip_MunicipalBoundaries_new.json'
+INCIDENTS_CSV = 'src/Dataset/processed/Combined_Incidents_GeoChart.csv'
+NO_MUNICIPALITY = 0  # OBJECTIDs start at 1
+
+
+def load_municipalities(path=MAP_BOUNDARIES):
+    """Municipality ids, names, polygons and their STRtree from the boundaries GeoJSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+    geometries = shapely.from_geojson([json.dumps(f['geometry']) for f in features])
+    shapely.prepare(geometries)
+    return {
+        'ids': np.array([f['properties']['OBJECTID'] for f in features], dtype=np.int16),
+        'names': [f['properties']['NAME'] for f in features],
+        'geometries': geometries,
+        'tree': shapely.STRtree(geometries),
+    }
+
+
+def tag_municipalities(df, municipalities):
+    """Municipality id of every row's latitude/longitude, NO_MUNICIPALITY if none."""
+    x = df['longitude'].to_numpy(dtype=np.float64)
+    y = df['latitude'].to_numpy(dtype=np.float64)
+    # Bounding-box candidates from the tree, then the exact test on the prepared polygons
+    point_idx, polygon_idx = municipalities['tree'].query(shapely.points(x, y))
+    inside = shapely.intersects_xy(municipalities['geometries'][polygon_idx], x[point_idx], y[point_idx])
+    point_idx, polygon_idx = point_idx[inside], polygon_idx[inside]
+    ids = np.full(len(df), np.iinfo(np.int16).max, dtype=np.int16)
+    np.minimum.at(ids, point_idx, municipalities['ids'][polygon_idx])
+    ids[ids == np.iinfo(np.int16).max] = NO_MUNICIPALITY
+    return pd.Series(ids, index=df.index, name='municipality_id')
+
+
+def municipality_counts(df, municipalities):
+    """Incidents per municipality, month and type for the tagged rows of df."""
+    tagged = df[df['municipality_id'] != NO_MUNICIPALITY]
+    counts = (tagged.groupby([tagged['municipality_id'], tagged['date'].dt.strftime('%Y-%m'),
+                              tagged['type']], observed=True)
+              .size().rename('count').reset_index()
+              .rename(columns={'date': 'month'}))
+    names = dict(zip(municipalities['ids'].tolist(), municipalities['names']))
+    counts.insert(1, 'municipality', counts['municipality_id'].map(names))
+    return counts.sort_values(['municipality_id', 'month', 'type'], ignore_index=True)
+
+
+def main():
+    import time
+
+    df = pd.read_csv(INCIDENTS_CSV, parse_dates=['date'])
+    municipalities = load_municipalities()
+    start = time.perf_counter()
+    df['municipality_id'] = tag_municipalities(df, municipalities)
+    elapsed = time.perf_counter() - start
+    matched = int((df['municipality_id'] != NO_MUNICIPALITY).sum())
+    print(f"Tagged {len(df)} incidents in {elapsed * 1000:.1f}ms: "
+          f"{matched} in {len(municipalities['ids'])} municipalities, {len(df) - matched} outside")
+    counts = municipality_counts(df, municipalities)
+    print(counts.groupby('municipality')['count'].sum().sort_values(ascending=False).to_string())
+
+
+if __name__ == "__main__":
+    main()
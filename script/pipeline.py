@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Incremental runner for the preprocessing scripts.
+
+Every stage is one script run with fixed parameters, declared with the input
+files it reads and the outputs it writes. After a successful run the
+manifest records the hashes of the inputs, of the script and the local
+modules it imports, the parameters and the outputs. On the next run a stage
+is skipped when all of these are unchanged and its outputs are still in
+place. Stages that do not depend on each other's outputs run concurrently.
+
+Stages marked optional build from source data that is not part of the
+repository (the ACLED export, the UNOSAT FileGDB). When their inputs are
+missing or the run fails they are reported and skipped: stages downstream
+use the outputs already in the tree and the runner still succeeds. A failed
+optional stage is not retried until its inputs or code change (or --force).
+
+Files whose size and modification time match the manifest are not re-read,
+so a no-op rebuild only stats the inputs.
+
+Usage:
+  python script/pipeline.py                      # run stages whose inputs changed
+  python script/pipeline.py geochart territories # only these stages
+  python script/pipeline.py --dry-run            # show what would run
+  python script/pipeline.py --force --jobs 2
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SCRIPT_DIR = Path(__file__).parent
+MANIFEST_PATH = PROJECT_ROOT / 'cache' / 'pipeline_manifest.json'
+LOG_DIR = PROJECT_ROOT / 'cache' / 'logs'
+
+# Paths are relative to the project root; directories (FileGDB) hash all their files
+STAGES = {
+    'acled': {
+        'script': 'script/preprocessing.py',
+        'args': [],
+        'optional': True,
+        'inputs': ['src/Dataset/Middle-East_aggregated_data_up_to-2025-12-06.csv',
+                   'src/Dataset/Mortality.csv'],
+        'outputs': ['src/Dataset/fatalities_per_month.csv', 'src/Dataset/events_per_week.csv',
+                    'src/Dataset/mortality_rate_grouped.csv', 'src/Dataset/events_sankey.csv',
+                    'src/Dataset/fatalities_per_month.bin', 'src/Dataset/events_per_week.bin',
+                    'src/Dataset/mortality_rate_grouped.bin', 'src/Dataset/events_sankey.bin'],
+    },
+    'small_multiples': {
+        'script': 'script/SmallMultipleDatasetProcessing.py',
+        'args': [],
+        'inputs': ['src/Dataset/GDP.csv', 'src/Dataset/SafelyDrinkingServices.csv',
+                   'src/Dataset/SafelySanitationServices.csv', 'src/Dataset/FoodInsecurity.csv'],
+        'outputs': ['src/Dataset/processed/Combined_SmallMultiple.csv',
+                    'src/Dataset/processed/Combined_SmallMultiple.bin'],
+    },
+    'geochart': {
+        'script': 'script/GeoChartPreprocessing.py',
+        'args': [],
+        'inputs': ['src/Dataset/2023-2025-pse-gaza-conflict-incidents-affecting-food-systems-incident-data-incident-data.csv',
+                   'src/Dataset/2023-2024-pse-shcc-health-care-data.csv',
+                   'src/GazaMap/GazaStrip_MunicipalBoundaries_new.json'],
+        'outputs': ['src/Dataset/processed/Combined_Incidents_GeoChart.csv',
+                    'src/Dataset/processed/Combined_Incidents_GeoChart.bin',
+                    'src/Dataset/processed/Combined_Incidents_Municipalities.csv',
+                    'src/Dataset/processed/Combined_Incidents_Municipalities.bin',
+                    'src/Dataset/processed/Combined_Incidents_TimeIndex.json',
+                    'src/Dataset/processed/Combined_Incidents_Projected.bin',
+                    'src/Dataset/processed/Combined_Incidents_Projected.json'],
+    },
+    'territories': {
+        'script': 'script/unified_territory_converter.py',
+        'args': [],
+        'inputs': ['src/GazaMap/GeoMap/Israel.gpkg', 'src/GazaMap/GeoMap/Palestine.gdb'],
+        'outputs': ['src/GazaMap/unified_territories.geojson',
+                    'src/GazaMap/unified_territories_bounds.json',
+                    'src/GazaMap/unified_territories.topo.json',
+                    'src/GazaMap/unified_territories.medium.topo.json',
+                    'src/GazaMap/unified_territories.low.topo.json',
+                    'src/GazaMap/territory_converter_debug.txt'],
+    },
+    'tiles': {
+        'script': 'script/vector_tiles.py',
+        'args': [],
+        'inputs': ['src/GazaMap/GeoMap/Israel.gpkg', 'src/GazaMap/GeoMap/Palestine.gdb',
+                   'src/GazaMap/GazaStrip_MunicipalBoundaries_new.json',
+                   'src/GazaMap/Damage_Sites_clusters_500m.geojson'],
+        'outputs': ['public/tiles/metadata.json'],
+    },
+    'damage_clusters': {
+        'script': 'script/damage_sites_to_clusters.py',
+        'args': ['--eps', '500'],
+        'optional': True,
+        'inputs': ['src/GazaMap/UNOSAT_GazaStrip_CDA_11October2025.gdb'],
+        'outputs': ['src/GazaMap/Damage_Sites_clusters_500m.geojson'],
+    },
+}
+
+
+# ---------------------------------------------------------------------------
+# Hashing
+# ---------------------------------------------------------------------------
+
+class FileHasher:
+    """Content hashes, reusing the previous hash when size and mtime match."""
+
+    def __init__(self, previous):
+        self.previous = previous  # path -> {'size', 'mtime_ns', 'sha256'}
+        self.current = {}
+
+    def _file(self, path):
+        st = os.stat(path)
+        old = self.previous.get(path)
+        if old and old['size'] == st.st_size and old['mtime_ns'] == st.st_mtime_ns:
+            digest = old['sha256']
+        else:
+            h = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+            digest = h.hexdigest()
+        self.current[path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        return digest
+
+    def hash(self, rel):
+        """Hash of a file or directory, or None if it does not exist."""
+        path = str(PROJECT_ROOT / rel)
+        if os.path.isfile(path):
+            return self._file(path)
+        if os.path.isdir(path):
+            h = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    h.update(os.path.relpath(full, path).encode('utf-8'))
+                    h.update(self._file(full).encode('ascii'))
+            return h.hexdigest()
+        return None
+
+
+def local_imports(script):
+    """The script and the script/ modules it imports, recursively."""
+    seen = []
+    todo = [Path(script).stem]
+    while todo:
+        name = todo.pop()
+        path = SCRIPT_DIR / f'{name}.py'
+        if name in seen or not path.exists():
+            continue
+        seen.append(name)
+        tree = ast.parse(path.read_text(encoding='utf-8'))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                todo.extend(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                todo.append(node.module.split('.')[0])
+    return sorted(f'script/{name}.py' for name in seen)
+
+
+def stage_key(stage, hasher):
+    """Everything a stage's outputs depend on; None values mark missing inputs."""
+    return {
+        'inputs': {rel: hasher.hash(rel) for rel in stage['inputs']},
+        'code': {rel: hasher.hash(rel) for rel in local_imports(PROJECT_ROOT / stage['script'])},
+        'args': stage['args'],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Scheduling
+# ---------------------------------------------------------------------------
+
+def upstream(stages):
+    """Map each stage to the stages that write one of its inputs."""
+    writers = {out: name for name, stage in stages.items() for out in stage['outputs']}
+    return {name: sorted({writers[i] for i in stage['inputs'] if i in writers} - {name})
+            for name, stage in stages.items()}
+
+
+def run_stage(name, stage):
+    """Run one stage script from the project root; return (ok, seconds, log path)."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = LOG_DIR / f'{name}.log'
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        result = subprocess.run([sys.executable, stage['script'], *stage['args']],
+                                cwd=PROJECT_ROOT, stdout=log, stderr=subprocess.STDOUT)
+    return result.returncode == 0, time.perf_counter() - start, log_path
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {'files': {}, 'stages': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild the preprocessing outputs whose inputs changed.")
+    parser.add_argument('stages', nargs='*',
+                        help=f"Stages to consider (default: all of {', '.join(STAGES)})")
+    parser.add_argument('--force', action='store_true', help="Run the stages even if up to date")
+    parser.add_argument('--dry-run', action='store_true', help="Only report which stages would run")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Stages run at the same time (default: CPU count)")
+    parser.add_argument('--manifest', default=str(MANIFEST_PATH), help="Manifest file")
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    return args
+
+
+def main():
+    start = time.perf_counter()
+    args = parse_args()
+    selected = {name: STAGES[name] for name in (args.stages or STAGES)}
+    deps = upstream(selected)
+    manifest = load_manifest(args.manifest)
+    hasher = FileHasher(manifest['files'])
+
+    done, failed, skipped, ran = set(), set(), set(), []
+    pending = dict(selected)
+
+    def fail(name, stage, message):
+        if stage.get('optional'):
+            print(f"  - {name}: {message}; optional, skipped")
+            skipped.add(name)
+        else:
+            print(f"  ✗ {name}: {message}")
+            failed.add(name)
+
+    with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        running = {}
+        while pending or running:
+            ready = [n for n in pending if all(d in done or d in failed or d in skipped for d in deps[n])]
+            if not ready and not running:
+                raise SystemExit(f"Circular stage dependencies: {', '.join(pending)}")
+            for name in ready:
+                stage = pending.pop(name)
+                if any(d in failed for d in deps[name]):
+                    print(f"  - {name}: skipped, upstream stage failed")
+                    failed.add(name)
+                    continue
+                # Keys are computed once the upstream outputs exist
+                key = stage_key(stage, hasher)
+                missing = [rel for rel, digest in key['inputs'].items() if digest is None]
+                if missing:
+                    fail(name, stage, f"missing input {', '.join(missing)}")
+                    continue
+                outputs = {rel: hasher.hash(rel) for rel in stage['outputs']}
+                record = manifest['stages'].get(name)
+                if not args.force and record and record['key'] == key:
+                    if record.get('failed'):
+                        fail(name, stage, f"failed before with the same inputs, see {LOG_DIR / f'{name}.log'}")
+                        continue
+                    if record['outputs'] == outputs:
+                        print(f"  ✓ {name}: up to date")
+                        done.add(name)
+                        continue
+                if args.dry_run:
+                    print(f"  • {name}: would run")
+                    done.add(name)
+                    continue
+                print(f"  ▶ {name}: running {stage['script']} {' '.join(stage['args'])}".rstrip())
+                running[pool.submit(run_stage, name, stage)] = (name, stage, key)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, stage, key = running.pop(future)
+                ok, seconds, log_path = future.result()
+                outputs = {rel: hasher.hash(rel) for rel in stage['outputs']}
+                if ok and all(outputs.values()):
+                    manifest['stages'][name] = {'key': key, 'outputs': outputs}
+                    print(f"  ✓ {name}: done in {seconds:.1f}s")
+                    done.add(name)
+                    ran.append(name)
+                else:
+                    manifest['stages'].pop(name, None)
+                    if stage.get('optional'):
+                        manifest['stages'][name] = {'key': key, 'failed': True}
+                    reason = 'failed' if not ok else 'did not write all outputs'
+                    fail(name, stage, f"{reason} after {seconds:.1f}s, see {log_path}")
+
+    if not args.dry_run:
+        manifest['files'] = {**manifest['files'], **hasher.current}
+        save_manifest(args.manifest, manifest)
+
+    print(f"\n{len(ran)} stage(s) run, {len(done) - len(ran)} up to date, "
+          f"{len(skipped)} optional skipped, {len(failed)} failed in {time.perf_counter() - start:.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Columnar intermediate store for the preprocessing stages.
+
+Stages hand typed DataFrames to each other in memory. Their intermediate
+results are also kept as Parquet (or Arrow IPC) files in a cache directory,
+keyed by a hash of the stage's input files and of the script that builds
+them together with the script/ modules it imports. A rerun with unchanged inputs loads the frame with its dtypes
+(categoricals, datetimes) instead of recomputing it, and only the final
+frontend artifacts are written as CSV.
+
+The cache lives in cache/stages/ at the project root. Set STAGE_STORE_DIR to
+use another directory, or to "off" to disable caching.
+
+Usage:
+  from stage_store import cached_frame
+
+  df = cached_frame('GDP_processed', ['src/Dataset/GDP.csv'], lambda: build_gdp())
+  df = cached_frame('Health_Incidents_Processed', [path], lambda: build(engine), params={'engine': engine})
+"""
+
+import glob
+import hashlib
+import inspect
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from pipeline import local_imports
+
+PROJECT_ROOT = Path(__file__).parent.parent
+STORE_DIR = os.environ.get('STAGE_STORE_DIR', str(PROJECT_ROOT / 'cache' / 'stages'))
+FORMAT = 'parquet'  # or 'arrow' (Arrow IPC / Feather v2)
+
+_SUFFIXES = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def input_hash(paths, *extra):
+    """SHA-256 over the contents of the input files and any extra strings."""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(os.path.basename(str(path)).encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    for value in extra:
+        h.update(str(value).encode('utf-8'))
+    return h.hexdigest()
+
+
+def write_frame(df, path):
+    if str(path).endswith('.arrow'):
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_parquet(path, index=False)
+
+
+def read_frame(path):
+    if str(path).endswith('.arrow'):
+        return pd.read_feather(path)
+    return pd.read_parquet(path)
+
+
+def cached_frame(name, inputs, build, store_dir=None, fmt=None, params=None):
+    """Return build(), cached under `name` for the current inputs.
+
+    The key also covers the source file of `build` and the script/ modules
+    it imports (as the pipeline tracks them), so editing a stage or one of
+    its helpers invalidates its cached results, and the `params` dict of build
+    arguments (e.g. the reader engine), so a frame built with one setting is
+    not reused for another. The index is not stored: frames come back with a
+    default RangeIndex.
+    """
+    store_dir = store_dir or STORE_DIR
+    if store_dir == 'off':
+        return build().reset_index(drop=True)
+
+    fmt = fmt or FORMAT
+    code = inspect.getsourcefile(build)
+    if code and os.path.exists(code):
+        inputs = list(inputs) + [PROJECT_ROOT / rel for rel in local_imports(code)]
+    settings = sorted((params or {}).items())
+    key = input_hash(inputs, name, fmt, *(f"{k}={v!r}" for k, v in settings))[:16]
+    path = os.path.join(store_dir, f"{name}.{key}{_SUFFIXES[fmt]}")
+    if os.path.exists(path):
+        print(f"  ✓ Loaded {name} from {path}")
+        return read_frame(path)
+
+    df = build().reset_index(drop=True)
+    os.makedirs(store_dir, exist_ok=True)
+    # Drop results of older inputs before writing the new one
+    for old in glob.glob(os.path.join(glob.escape(store_dir), f"{glob.escape(name)}.*")):
+        os.remove(old)
+    write_frame(df, path)
+    return df
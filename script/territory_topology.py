@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Shared-arc topology and multi-level TopoJSON output for polygon layers.
+
+Coordinates are quantized to an integer grid first, so borders that the
+Israel and Palestine layers (or neighbouring admin units) have in common
+snap to the same points. Snapping goes through GEOS precision reduction
+(set_precision), which nodes edges that would cross after rounding, so every
+quantized geometry is still valid. Every ring is cut at its junctions - points where
+the rings sharing them part ways - into arcs, and each arc is stored once
+and referenced by all rings that use it (reversed references are ~index,
+as in TopoJSON).
+
+Simplification runs on the arcs, not on the polygons: a shared border is
+simplified once, so neighbours stay gap-free and overlap-free at every
+level. Arc endpoints (the junctions) are never moved. Simplifying an arc
+can still break a feature (a ring crossing itself or another ring of the
+feature, or a reversed ring); the arcs of such features are simplified with
+a smaller tolerance, down to not at all, until every feature is valid. Arcs are written delta-encoded in quantized units.
+
+Usage:
+  from territory_topology import save_topology_levels
+
+  report = save_topology_levels(gdf.geometry.to_numpy(), properties, ids, 'src/GazaMap/unified_territories')
+  print_report(report, 'src/GazaMap/unified_territories.geojson', geojson_vertices)
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+
+QUANTIZATION = 100000
+# Douglas-Peucker tolerance of each level, in degrees; level "full" is only quantized
+LEVELS = {'full': 0.0, 'medium': 0.001, 'low': 0.005}
+
+
+def _quantize(geometries, quantization):
+    x0, y0, x1, y1 = shapely.total_bounds(geometries)
+    scale = [(x1 - x0) / (quantization - 1) or 1.0, (y1 - y0) / (quantization - 1) or 1.0]
+    return {'scale': scale, 'translate': [float(x0), float(y0)]}
+
+
+def _snap(geometries, transform):
+    """Geometries in grid units, snapped to the integer grid without becoming invalid."""
+    translate = np.array(transform['translate'])
+    scale = np.array(transform['scale'])
+    grid = shapely.transform(geometries, lambda coords: (coords - translate) / scale)
+    return shapely.set_precision(grid, 1.0)
+
+
+def _ring_points(geometries):
+    """Ring points of snapped geometries without consecutive duplicates or the closing point.
+
+    Returns (x, y, ring of each point, polygon of each ring, geometry of each polygon,
+    whether each ring is an exterior).
+    """
+    polygons, polygon_geom = shapely.get_parts(geometries, return_index=True)
+    rings, ring_polygon = shapely.get_rings(polygons, return_index=True)
+    exterior = np.r_[True, ring_polygon[1:] != ring_polygon[:-1]] if len(rings) else np.zeros(0, bool)
+    coords, point_ring = shapely.get_coordinates(rings, return_index=True)
+
+    qx = np.round(coords[:, 0]).astype(np.int64)
+    qy = np.round(coords[:, 1]).astype(np.int64)
+    same_ring = np.r_[False, point_ring[1:] == point_ring[:-1]]
+    repeated = same_ring & np.r_[False, (qx[1:] == qx[:-1]) & (qy[1:] == qy[:-1])]
+    qx, qy, point_ring = qx[~repeated], qy[~repeated], point_ring[~repeated]
+    # Drop the closing point of every ring (it equals the first one)
+    last = np.r_[point_ring[1:] != point_ring[:-1], True]
+    first = np.r_[True, point_ring[1:] != point_ring[:-1]]
+    first_of_last = np.maximum.accumulate(np.where(first, np.arange(len(first)), 0))
+    closing = last & ~first & (qx == qx[first_of_last]) & (qy == qy[first_of_last])
+    keep = ~closing
+    return qx[keep], qy[keep], point_ring[keep], ring_polygon, polygon_geom, exterior
+
+
+def build_topology(geometries, quantization=QUANTIZATION):
+    """Quantize Polygon/MultiPolygon geometries and cut their rings into shared arcs."""
+    geometries = np.asarray(geometries, dtype=object)
+    types = set(shapely.get_type_id(geometries[~shapely.is_missing(geometries)]).tolist())
+    unsupported = types - {3, 6}
+    if unsupported:
+        names = sorted(shapely.GeometryType(t).name for t in unsupported)
+        raise ValueError(f"Topology supports Polygon and MultiPolygon only, found {', '.join(names)}")
+
+    transform = _quantize(geometries, quantization)
+    snapped = _snap(geometries, transform)
+    qx, qy, point_ring, ring_polygon, polygon_geom, exterior = _ring_points(snapped)
+    key = qx * quantization + qy
+
+    # Cyclic neighbours of every point within its ring
+    starts = np.flatnonzero(np.r_[True, point_ring[1:] != point_ring[:-1]])
+    ends = np.r_[starts[1:], len(key)]
+    positions = np.arange(len(key))
+    ring_start = np.repeat(starts, ends - starts)
+    ring_end = np.repeat(ends, ends - starts)
+    prev_key = key[np.where(positions == ring_start, ring_end - 1, positions - 1)]
+    next_key = key[np.where(positions == ring_end - 1, ring_start, positions + 1)]
+    # A point is a junction if the rings through it do not all share the same neighbours
+    pairs = pd.DataFrame({'key': key, 'a': np.minimum(prev_key, next_key), 'b': np.maximum(prev_key, next_key)})
+    neighbour_sets = pairs.drop_duplicates().groupby('key').size()
+    junction = pairs['key'].map(neighbour_sets).to_numpy() > 1
+
+    arcs, index = [], {}
+
+    def arc_id(points):
+        forward, backward = tuple(points), tuple(points[::-1])
+        if forward in index:
+            return index[forward]
+        if backward in index:
+            return ~index[backward]
+        index[forward] = len(arcs)
+        arcs.append(forward)
+        return index[forward]
+
+    ring_arcs = {}
+    for ring, start, end in zip(point_ring[starts].tolist(), starts.tolist(), ends.tolist()):
+        points = key[start:end]
+        if len(points) < 3:
+            continue
+        cuts = np.flatnonzero(junction[start:end])
+        if len(cuts) == 0:
+            # Closed arc: start at the smallest key and pick the smaller direction,
+            # so the same ring in two features is stored once
+            i = int(np.argmin(points))
+            forward = np.r_[points[i:], points[:i], points[i]]
+            backward = forward[::-1]
+            if tuple(backward) < tuple(forward):
+                ring_arcs[ring] = [~arc_id(backward)]
+            else:
+                ring_arcs[ring] = [arc_id(forward)]
+            continue
+        rotated = np.r_[points[cuts[0]:], points[:cuts[0]], points[cuts[0]]]
+        cuts = np.r_[cuts - cuts[0], len(points)]
+        ring_arcs[ring] = [arc_id(rotated[a:b + 1]) for a, b in zip(cuts[:-1], cuts[1:])]
+
+    arc_coords = [np.column_stack(divmod(np.array(arc, dtype=np.int64), quantization)) for arc in arcs]
+    return {
+        'transform': transform,
+        'bbox': [float(v) for v in shapely.total_bounds(geometries)],
+        'arcs': arc_coords,
+        'ring_arcs': ring_arcs,
+        'ring_polygon': ring_polygon,
+        'polygon_geom': polygon_geom,
+        'exterior': exterior,
+        'types': shapely.get_type_id(snapped),
+    }
+
+
+def simplify_arcs(arcs, tolerance):
+    """Douglas-Peucker per arc in quantized units; endpoints are kept, closed arcs keep 4 points.
+
+    tolerance is one value for all arcs or one per arc; arcs with a
+    tolerance of 0 are returned unchanged.
+    """
+    tolerance = np.broadcast_to(np.asarray(tolerance, dtype=np.float64), (len(arcs),))
+    if not arcs or not (tolerance > 0).any():
+        return arcs
+    lengths = np.array([len(a) for a in arcs])
+    lines = shapely.linestrings(np.concatenate(arcs).astype(np.float64),
+                                indices=np.repeat(np.arange(len(arcs)), lengths))
+    coords, arc_index = shapely.get_coordinates(
+        shapely.simplify(lines, tolerance, preserve_topology=False), return_index=True)
+    simplified = np.split(coords.astype(np.int64), np.cumsum(np.bincount(arc_index, minlength=len(arcs)))[:-1])
+    out = []
+    for arc, coords, tol in zip(arcs, simplified, tolerance.tolist()):
+        if tol <= 0:
+            coords = arc
+        elif len(coords) < 4 and (arc[0] == arc[-1]).all():
+            coords = arc[np.round(np.linspace(0, len(arc) - 1, 4)).astype(int)]
+        out.append(coords)
+    return out
+
+
+def _arc_length(ref, arcs):
+    return len(arcs[ref if ref >= 0 else ~ref]) - 1
+
+
+def _feature_parts(topology, arcs):
+    """Arc references of every feature: a list of polygons, each a list of rings.
+
+    Rings that collapse below three points are dropped, as are polygons whose
+    exterior ring collapsed.
+    """
+    polygons = {}
+    for ring, refs in sorted(topology['ring_arcs'].items()):
+        polygon = int(topology['ring_polygon'][ring])
+        if sum(_arc_length(r, arcs) for r in refs) < 3:
+            if topology['exterior'][ring]:
+                polygons[polygon] = None
+            continue
+        if topology['exterior'][ring]:
+            polygons[polygon] = [refs]
+        elif polygons.get(polygon) is not None:
+            polygons[polygon].append(refs)
+
+    geometries = [[] for _ in range(len(topology['types']))]
+    for polygon, rings in sorted(polygons.items()):
+        if rings is not None:
+            geometries[int(topology['polygon_geom'][polygon])].append(rings)
+    return geometries
+
+
+def _ring_coords(refs, arcs):
+    parts = [arcs[r] if r >= 0 else arcs[~r][::-1] for r in refs]
+    return np.concatenate([parts[0]] + [p[1:] for p in parts[1:]])
+
+
+def decode_geometries(topology, arcs):
+    """Shapely geometries of the features in grid units (None for collapsed ones)."""
+    geometries = []
+    for parts in _feature_parts(topology, arcs):
+        polygons = [shapely.Polygon(_ring_coords(rings[0], arcs), [_ring_coords(r, arcs) for r in rings[1:]])
+                    for rings in parts]
+        geometries.append(shapely.MultiPolygon(polygons) if polygons else None)
+    return np.array(geometries, dtype=object)
+
+
+def _ring_signs(topology, arcs):
+    """Sign of the area of every ring (+1 counter-clockwise), 0 where it collapsed."""
+    signs = {}
+    for ring, refs in topology['ring_arcs'].items():
+        if sum(_arc_length(r, arcs) for r in refs) < 3:
+            signs[ring] = 0.0
+            continue
+        c = _ring_coords(refs, arcs).astype(np.float64)
+        signs[ring] = float(np.sign(np.dot(c[:-1, 0], c[1:, 1]) - np.dot(c[1:, 0], c[:-1, 1])))
+    return signs
+
+
+def _bad_features(topology, arcs, full_signs):
+    """Features that are invalid or have a ring whose winding changed from the full level."""
+    geometries = decode_geometries(topology, arcs)
+    bad = set(np.flatnonzero(~shapely.is_valid(geometries) & ~shapely.is_missing(geometries)).tolist())
+    for ring, sign in _ring_signs(topology, arcs).items():
+        if sign and sign != full_signs[ring]:
+            bad.add(int(topology['polygon_geom'][topology['ring_polygon'][ring]]))
+    return bad
+
+
+def repair_arcs(topology, arcs, tolerance):
+    """Simplify the arcs of broken features less until every feature is valid.
+
+    A feature is broken when simplification made it invalid or reversed the
+    winding of one of its rings. Its arcs are simplified again with a quarter
+    of their tolerance, and kept unsimplified once that drops below one grid
+    unit. A changed arc also changes the features sharing it, so this repeats
+    until no broken feature has a simplified arc left. Returns (arcs, number
+    of arcs simplified less, number of broken features left).
+    """
+    full = topology['arcs']
+    arcs = list(arcs)
+    tolerances = np.full(len(arcs), float(tolerance))
+    full_signs = _ring_signs(topology, full)
+    feature_rings = {}
+    for ring in topology['ring_arcs']:
+        feature = int(topology['polygon_geom'][topology['ring_polygon'][ring]])
+        feature_rings.setdefault(feature, []).append(ring)
+    repaired = set()
+    while True:
+        bad = _bad_features(topology, arcs, full_signs)
+        affected = sorted({r if r >= 0 else ~r for feature in bad for ring in feature_rings[feature]
+                           for r in topology['ring_arcs'][ring]})
+        affected = [a for a in affected if tolerances[a] > 0]
+        if not bad or not affected:
+            return arcs, len(repaired), len(bad)
+        for a in affected:
+            tolerances[a] = tolerances[a] / 4 if tolerances[a] / 4 >= 1 else 0.0
+        for a, coords in zip(affected, simplify_arcs([full[a] for a in affected], tolerances[affected])):
+            arcs[a] = coords
+        repaired.update(affected)
+
+
+def topology_json(topology, arcs, properties, ids, object_name='territories'):
+    """TopoJSON text of the topology with the given (possibly simplified) arcs.
+
+    Returns (text, number of features left without a geometry because all
+    their rings collapsed).
+    """
+    geometries = _feature_parts(topology, arcs)
+
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    objects = []
+    collapsed = 0
+    for parts, type_id, props, idx in zip(geometries, topology['types'], properties, ids):
+        if not parts:
+            geometry = '"type":null'
+            collapsed += int(type_id >= 0)
+        elif type_id == 3:
+            geometry = '"type":"Polygon","arcs":' + encode(parts[0])
+        else:
+            geometry = '"type":"MultiPolygon","arcs":' + encode(parts)
+        objects.append('{' + geometry + ',"id":' + encode(idx) + ',"properties":' + props + '}')
+
+    arc_text = ','.join(encode(np.r_[a[:1], np.diff(a, axis=0)].tolist()) for a in arcs)
+    text = ('{"type":"Topology","bbox":' + encode(topology['bbox'])
+            + ',"transform":' + encode(topology['transform'])
+            + ',"objects":{' + encode(object_name) + ':{"type":"GeometryCollection","geometries":['
+            + ','.join(objects) + ']}},"arcs":[' + arc_text + ']}')
+    return text, collapsed
+
+
+def save_topology_levels(geometries, properties, ids, prefix, levels=None, quantization=QUANTIZATION):
+    """Write <prefix>.topo.json (full) and <prefix>.<level>.topo.json; return the report rows."""
+    levels = LEVELS if levels is None else levels
+    properties = list(properties)
+    topology = build_topology(geometries, quantization)
+    unit = min(topology['transform']['scale'])
+    shared = sum(1 for refs in topology['ring_arcs'].values() for r in refs if r < 0)
+    print(f"  Topology: {len(topology['arcs'])} arcs, {shared} reversed (shared) arc references")
+
+    report = []
+    for level, tolerance in levels.items():
+        arcs, repaired, invalid = repair_arcs(topology, simplify_arcs(topology['arcs'], tolerance / unit),
+                                              tolerance / unit)
+        path = f'{prefix}.topo.json' if level == 'full' else f'{prefix}.{level}.topo.json'
+        text, collapsed = topology_json(topology, arcs, properties, ids)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        report.append({'level': level, 'tolerance': tolerance, 'path': path, 'collapsed': collapsed,
+                       'repaired': repaired, 'invalid': invalid,
+                       'vertices': int(sum(len(a) for a in arcs)), 'bytes': os.path.getsize(path)})
+    return report
+
+
+def print_report(report, geojson_path=None, geojson_vertices=None):
+    """Print file size, vertex count and invalid features of each level against the GeoJSON."""
+    base_bytes = os.path.getsize(geojson_path) if geojson_path and os.path.exists(geojson_path) else None
+    if base_bytes is not None:
+        print(f"  {'geojson':<8} {'-':>10} {geojson_vertices or 0:>10} vertices {base_bytes / 1024:>9.1f} KB")
+    for row in report:
+        line = (f"  {row['level']:<8} {row['tolerance']:>10g} {row['vertices']:>10} vertices "
+                f"{row['bytes'] / 1024:>9.1f} KB")
+        if base_bytes and geojson_vertices:
+            line += (f"  ({100 * (1 - row['bytes'] / base_bytes):.1f}% smaller, "
+                     f"{100 * (1 - row['vertices'] / geojson_vertices):.1f}% fewer vertices)")
+        line += f", {row['invalid']} invalid"
+        if row['repaired']:
+            line += f" ({row['repaired']} arc(s) simplified less to keep them valid)"
+        if row['collapsed']:
+            line += f", {row['collapsed']} feature(s) too small for this level"
+        print(line)
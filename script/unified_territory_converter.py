@@ -6,11 +6,14 @@ with country/territory identifiers and proper coordinate reference system handli
 """
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 import json
 import os
 from pathlib import Path
 
+from layer_reader import list_layers, read_layer
+
 # Set up paths
 PROJECT_ROOT = Path(__file__).parent.parent
 GEOMAP_DIR = PROJECT_ROOT / 'src' / 'GazaMap' / 'GeoMap'
@@ -20,9 +23,24 @@ OUTPUT_DIR = PROJECT_ROOT / 'src' / 'GazaMap'
 ISRAEL_GPKG = GEOMAP_DIR / 'Israel.gpkg'
 PALESTINE_GDB = GEOMAP_DIR / 'Palestine.gdb'
 
+# Layers read from the sources (None = the only layer). All attribute columns are
+# read: standardize_geom_columns keeps them and they are published as properties.
+ISRAEL_LAYER = None
+PALESTINE_LAYER = 'pse_admin0'
+
 # Output files
 OUTPUT_UNIFIED_GEOJSON = OUTPUT_DIR / 'unified_territories.geojson'
 OUTPUT_DEBUG_INFO = OUTPUT_DIR / 'territory_converter_debug.txt'
+OUTPUT_BOUNDS = OUTPUT_DIR / 'unified_territories_bounds.json'
+# TopoJSON levels: <prefix>.topo.json, <prefix>.<level>.topo.json
+OUTPUT_TOPOJSON_PREFIX = OUTPUT_DIR / 'unified_territories'
+
+
+def _print_layer_summary(gdf):
+    print(f"  - Number of features: {len(gdf)}")
+    print(f"  - Columns: {gdf.columns.tolist()}")
+    print(f"  - CRS: {gdf.crs}")
+    print(f"  - Geometry types: {gdf.geometry.type.unique().tolist()}")
 
 
 def read_israel_data():
@@ -32,12 +50,9 @@ def read_israel_data():
     print("=" * 60)
     
     try:
-        gdf = gpd.read_file(ISRAEL_GPKG)
+        gdf = read_layer(ISRAEL_GPKG, layer=ISRAEL_LAYER)
         print(f"✓ Successfully read Israel GPKG file")
-        print(f"  - Number of features: {len(gdf)}")
-        print(f"  - Columns: {gdf.columns.tolist()}")
-        print(f"  - CRS: {gdf.crs}")
-        print(f"  - Geometry types: {gdf.geometry.type.unique().tolist()}")
+        _print_layer_summary(gdf)
         
         return gdf
     except Exception as e:
@@ -52,18 +67,13 @@ def read_palestine_data():
     print("=" * 60)
     
     try:
-        # Read all layers from the GDB and explore them
-        layers = gpd.read_file(PALESTINE_GDB, layer=None)
-        print(f"✓ Available layers in GDB: {layers}")
+        # Layer names come from the GDB metadata; only the chosen layer is read
+        layers = list_layers(PALESTINE_GDB)
+        print(f"✓ Available layers in GDB: {', '.join(f'{name} ({kind})' for name, kind in layers.items())}")
         
-        # Try to read the main layer (usually the first or a specific one)
-        # GDB files typically contain a main geometry layer
-        gdf = gpd.read_file(PALESTINE_GDB)
-        print(f"✓ Successfully read Palestine GDB file")
-        print(f"  - Number of features: {len(gdf)}")
-        print(f"  - Columns: {gdf.columns.tolist()}")
-        print(f"  - CRS: {gdf.crs}")
-        print(f"  - Geometry types: {gdf.geometry.type.unique().tolist()}")
+        gdf = read_layer(PALESTINE_GDB, layer=PALESTINE_LAYER)
+        print(f"✓ Successfully read Palestine GDB layer '{PALESTINE_LAYER}'")
+        _print_layer_summary(gdf)
         
         return gdf
     except Exception as e:
@@ -144,91 +154,152 @@ def merge_geospatial_data(israel_gdf, palestine_gdf):
     return merged
 
 
+def _property_fragments(series):
+    """JSON text of each value of a property column, None where it is missing.
+
+    How a value is written is decided once per column dtype: numbers and
+    booleans as JSON numbers, strings as JSON strings, datetimes as their
+    str(). Only object (and categorical) columns, which can mix types, fall
+    back to str() value by value when a value is not JSON serializable.
+    """
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    missing = series.isna().to_numpy()
+    values = series.tolist()
+    if series.dtype == object or isinstance(series.dtype, pd.CategoricalDtype):
+        def to_json(value):
+            try:
+                return encode(value)
+            except (TypeError, ValueError):
+                return encode(str(value))
+    elif (pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series)
+          or pd.api.types.is_string_dtype(series)):
+        to_json = encode
+    else:
+        to_json = lambda value: encode(str(value))
+    return [None if miss else to_json(value) for value, miss in zip(values, missing)]
+
+
+def _bbox_fragments(bounds):
+    """JSON text of each [minx, miny, maxx, maxy] row, None for empty geometries."""
+    missing = np.isnan(bounds).any(axis=1)
+    return [None if miss else json.dumps(row) for row, miss in zip(bounds.tolist(), missing)]
+
+
+def iter_properties_json(gdf):
+    """Yield the properties object of each row as JSON text, converted column by column."""
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    columns = ['country', 'territory'] + [
+        col for col in gdf.columns if col not in ('geometry', gdf.geometry.name, 'country', 'territory')]
+    # country and territory are always present; other properties are left out when missing
+    properties = [(encode(str(col)) + ': ', _property_fragments(gdf[col]), col in ('country', 'territory'))
+                  for col in columns]
+
+    for row in range(len(gdf)):
+        props = []
+        for key, values, required in properties:
+            value = values[row]
+            if value is not None:
+                props.append(key + value)
+            elif required:
+                props.append(key + 'null')
+        yield '{' + ', '.join(props) + '}'
+
+
+def iter_geojson_features(gdf):
+    """
+    Yield each row of the GeoDataFrame as GeoJSON Feature text.
+    Properties are converted column by column and geometries in bulk.
+    """
+    import shapely
+
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    geometries = shapely.to_geojson(gdf.geometry.to_numpy())
+    bboxes = _bbox_fragments(shapely.bounds(gdf.geometry.to_numpy()))
+
+    for idx, props, bbox, geometry in zip(gdf.index.tolist(), iter_properties_json(gdf), bboxes, geometries):
+        yield ('{"type": "Feature", "id": ' + encode(idx) + ', "properties": ' + props
+               + (', "bbox": ' + bbox if bbox is not None else '')
+               + ', "geometry": ' + (geometry if geometry is not None else 'null') + '}')
+
+
 def create_geojson_with_properties(gdf):
     """
     Convert GeoDataFrame to GeoJSON with enhanced properties.
+    Use save_geojson to write it without building the dict.
     """
-    print("\nCreating GeoJSON...")
-    
-    from shapely.geometry import mapping
-    
-    features = []
-    for idx, row in gdf.iterrows():
-        feature = {
-            "type": "Feature",
-            "id": idx,
-            "properties": {
-                "country": row['country'],
-                "territory": row['territory'],
-            },
-            "geometry": mapping(row.geometry)
-        }
-        
-        # Add other relevant properties
-        for col in row.index:
-            if col not in ['geometry', 'country', 'territory']:
-                value = row[col]
-                # Handle non-serializable types
-                if value is not None and not pd.isna(value):
-                    try:
-                        json.dumps(value)
-                        feature['properties'][col] = value
-                    except (TypeError, ValueError):
-                        feature['properties'][col] = str(value)
-        
-        features.append(feature)
-    
-    geojson = {
+    return {
         "type": "FeatureCollection",
-        "features": features
+        "features": [json.loads(feature) for feature in iter_geojson_features(gdf)]
     }
-    
-    return geojson
 
 
-def calculate_bounds(geojson):
-    """Calculate bounding box for the entire map."""
-    min_lon, min_lat = float('inf'), float('inf')
-    max_lon, max_lat = float('-inf'), float('-inf')
-    
-    for feature in geojson['features']:
-        if feature['geometry']['type'] == 'Polygon':
-            for ring in feature['geometry']['coordinates']:
-                for coord in ring:
-                    lon, lat = coord[0], coord[1]
-                    min_lon = min(min_lon, lon)
-                    min_lat = min(min_lat, lat)
-                    max_lon = max(max_lon, lon)
-                    max_lat = max(max_lat, lat)
-        elif feature['geometry']['type'] == 'MultiPolygon':
-            for polygon in feature['geometry']['coordinates']:
-                for ring in polygon:
-                    for coord in ring:
-                        lon, lat = coord[0], coord[1]
-                        min_lon = min(min_lon, lon)
-                        min_lat = min(min_lat, lat)
-                        max_lon = max(max_lon, lon)
-                        max_lat = max(max_lat, lat)
-    
+def _bounds_entry(minx, miny, maxx, maxy):
     return {
         "type": "bounds",
-        "coordinates": [min_lon, min_lat, max_lon, max_lat],
-        "center": [(min_lon + max_lon) / 2, (min_lat + max_lat) / 2]
+        "coordinates": [minx, miny, maxx, maxy],
+        "center": [(minx + maxx) / 2, (miny + maxy) / 2]
     }
 
 
-def save_geojson(geojson, output_path):
-    """Save GeoJSON to file."""
+def calculate_bounds(gdf):
+    """
+    Calculate bounding boxes from the geometry array: the whole map and
+    each country. Covers every geometry type; empty geometries are ignored.
+    """
+    bounds = gdf.bounds.dropna()
+    result = _bounds_entry(*(float(v) for v in gdf.total_bounds))
+    per_country = bounds.groupby(gdf.loc[bounds.index, 'country']).agg(
+        {'minx': 'min', 'miny': 'min', 'maxx': 'max', 'maxy': 'max'})
+    result["countries"] = {
+        str(country): _bounds_entry(*(float(v) for v in row))
+        for country, row in zip(per_country.index, per_country.itertuples(index=False))
+    }
+    return result
+
+
+def save_bounds(bounds, output_path):
+    """Save map and per-country bounds for fitting views without the GeoJSON."""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(bounds, f, indent=2)
+    print(f"✓ Bounds saved to: {output_path}")
+
+
+def save_geojson(gdf, output_path):
+    """
+    Stream the GeoDataFrame to a GeoJSON file, one feature per line.
+    The collection and every non-empty feature carry a "bbox".
+    """
     print(f"\nSaving GeoJSON to: {output_path}")
     
+    count = 0
+    total = gdf.total_bounds
+    bbox = '' if np.isnan(total).any() else f'"bbox": {json.dumps(total.tolist())}, '
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(geojson, f, indent=2, ensure_ascii=False)
+        f.write('{"type": "FeatureCollection", ' + bbox + '"features": [\n')
+        for feature in iter_geojson_features(gdf):
+            if count:
+                f.write(',\n')
+            f.write(feature)
+            count += 1
+        f.write('\n]}\n')
     
     print(f"✓ GeoJSON saved successfully")
-    print(f"  - Total features: {len(geojson['features'])}")
+    print(f"  - Total features: {count}")
     print(f"  - File size: {os.path.getsize(output_path) / 1024:.2f} KB")
 
 
+def save_topology(gdf, prefix, geojson_path):
+    """Write the quantized TopoJSON levels and report size and vertices against the GeoJSON."""
+    import shapely
+    from territory_topology import print_report, save_topology_levels
+    
+    print(f"\nSaving TopoJSON levels to: {prefix}.*.topo.json")
+    report = save_topology_levels(gdf.geometry.to_numpy(), iter_properties_json(gdf),
+                                  gdf.index.tolist(), str(prefix))
+    print_report(report, geojson_path, int(shapely.get_num_coordinates(gdf.geometry.to_numpy()).sum()))
+    return report
+
+
 def save_debug_info(israel_gdf, palestine_gdf, bounds, output_path):
     """Save debug information about the conversion."""
     with open(output_path, 'w', encoding='utf-8') as f:
@@ -256,6 +327,8 @@ def save_debug_info(israel_gdf, palestine_gdf, bounds, output_path):
         f.write(f"Min/Max Lon: {bounds['coordinates'][0]}, {bounds['coordinates'][2]}\n")
         f.write(f"Min/Max Lat: {bounds['coordinates'][1]}, {bounds['coordinates'][3]}\n")
         f.write(f"Center: {bounds['center']}\n")
+        for country, country_bounds in bounds['countries'].items():
+            f.write(f"{country}: {country_bounds['coordinates']}\n")
     
     print(f"\n✓ Debug info saved to: {output_path}")
 
@@ -288,14 +361,15 @@ def main():
         # Merge
         merged_gdf = merge_geospatial_data(israel_gdf, palestine_gdf)
         
-        # Create GeoJSON
-        geojson = create_geojson_with_properties(merged_gdf)
+        # Save GeoJSON, streamed feature by feature
+        save_geojson(merged_gdf, OUTPUT_UNIFIED_GEOJSON)
         
-        # Calculate bounds
-        bounds = calculate_bounds(geojson)
+        # Shared-arc TopoJSON at several simplification levels
+        save_topology(merged_gdf, OUTPUT_TOPOJSON_PREFIX, OUTPUT_UNIFIED_GEOJSON)
         
-        # Save GeoJSON
-        save_geojson(geojson, OUTPUT_UNIFIED_GEOJSON)
+        # Calculate map and per-country bounds
+        bounds = calculate_bounds(merged_gdf)
+        save_bounds(bounds, OUTPUT_BOUNDS)
         
         # Save debug info
         save_debug_info(israel_gdf, palestine_gdf, bounds, OUTPUT_DEBUG_INFO)
@@ -307,6 +381,8 @@ def main():
         print(f"\nOutput files created:")
         print(f"  ✓ {OUTPUT_UNIFIED_GEOJSON}")
         print(f"  ✓ {OUTPUT_DEBUG_INFO}")
+        print(f"  ✓ {OUTPUT_BOUNDS}")
+        print(f"  ✓ {OUTPUT_TOPOJSON_PREFIX}.topo.json (+ simplified levels)")
         print(f"\nMap bounds:")
         print(f"  Longitude: {bounds['coordinates'][0]:.4f} to {bounds['coordinates'][2]:.4f}")
         print(f"  Latitude: {bounds['coordinates'][1]:.4f} to {bounds['coordinates'][3]:.4f}")
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Mapbox Vector Tile pyramid for the map layers.
+
+Each layer is read with geopandas (the territories through the readers in
+unified_territory_converter.py), projected to Web Mercator and, per zoom
+level, simplified once to the size of a tile unit. Every feature is then
+assigned to the z/x/y tiles its bounding box covers, clipped to each tile
+(with a small buffer so strokes do not show seams) and encoded in tile
+coordinates as MVT 2.1 protobuf. Only tiles with content are written.
+
+The pyramid goes to a directory ({z}/{x}/{y}.pbf plus metadata.json, which
+Vite serves from public/) or, for an output ending in .mbtiles, to an
+MBTiles 1.3 SQLite file with gzipped tiles. Every run replaces the previous
+pyramid, and each tile holds all of its layers, so a run limited to some
+layers or zoom levels needs --clean to overwrite an existing pyramid.
+
+Usage:
+  python script/vector_tiles.py                                   # public/tiles/{z}/{x}/{y}.pbf
+  python script/vector_tiles.py --output cache/map.mbtiles
+  python script/vector_tiles.py --output cache/tiles --layers municipalities damage_clusters --maxzoom 12
+"""
+
+import argparse
+import gzip
+import json
+import math
+import os
+import sqlite3
+import struct
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import shapely
+
+PROJECT_ROOT = Path(__file__).parent.parent
+OUTPUT_PATH = PROJECT_ROOT / 'public' / 'tiles'
+
+EXTENT = 4096
+BUFFER = 64              # tile units clipped beyond each tile edge
+SIMPLIFY_UNITS = 1.0     # simplification tolerance per zoom, in tile units
+ORIGIN = 20037508.342789244  # half the Web Mercator world width in meters
+
+# properties: columns written as feature attributes (None writes all)
+LAYERS = {
+    'territories': {
+        'source': 'territories',
+        'minzoom': 4, 'maxzoom': 10,
+        'properties': ['country', 'territory', 'name', 'name_en', 'admin_level', 'adm0_name'],
+    },
+    'municipalities': {
+        'source': 'src/GazaMap/GazaStrip_MunicipalBoundaries_new.json',
+        'minzoom': 8, 'maxzoom': 13,
+        'properties': ['OBJECTID', 'NAME'],
+    },
+    'damage_clusters': {
+        'source': 'src/GazaMap/Damage_Sites_clusters_500m.geojson',
+        'minzoom': 9, 'maxzoom': 13,
+        'properties': None,
+    },
+}
+
+GEOM_POINT, GEOM_LINESTRING, GEOM_POLYGON = 1, 2, 3
+CMD_MOVE_TO, CMD_LINE_TO, CMD_CLOSE_PATH = 1, 2, 7
+
+
+# ---------------------------------------------------------------------------
+# Protobuf encoding (vector_tile.proto, version 2)
+# ---------------------------------------------------------------------------
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _packed(values):
+    out = bytearray()
+    for value in values:
+        while value > 0x7f:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def _field(number, data):
+    """Length-delimited field."""
+    return _varint(number << 3 | 2) + _varint(len(data)) + data
+
+
+def _varint_field(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def _zigzag(values):
+    return (values << 1) ^ (values >> 63)
+
+
+def _command(command, count):
+    return command & 0x7 | count << 3
+
+
+def _encode_value(value):
+    if isinstance(value, (bool, np.bool_)):
+        return _varint_field(7, int(value))
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        return _varint_field(5, value) if value >= 0 else _varint_field(6, (value << 1) ^ (value >> 63))
+    if isinstance(value, (float, np.floating)):
+        return _varint(3 << 3 | 1) + struct.pack('<d', float(value))
+    return _field(1, str(value).encode('utf-8'))
+
+
+def _ring_area(ring):
+    """Signed area in tile coordinates (y down): positive for MVT exterior rings."""
+    x, y = ring[:, 0], ring[:, 1]
+    return float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2
+
+
+def _encode_geometry(geom):
+    """MVT (type, command integers) of a geometry in integer tile coordinates, or None if empty."""
+    commands = []
+    cursor = np.zeros(2, dtype=np.int64)
+
+    def line(coords, close, winding=0):
+        """Append one line or ring; rings get the sign of area given by winding."""
+        nonlocal cursor
+        coords = coords.astype(np.int64)
+        # Drop repeated points created by rounding to the tile grid
+        keep = np.r_[True, (np.diff(coords, axis=0) != 0).any(axis=1)]
+        coords = coords[keep]
+        if close:
+            if len(coords) > 1 and (coords[0] == coords[-1]).all():
+                coords = coords[:-1]
+            area = _ring_area(coords) if len(coords) >= 3 else 0.0
+            # Rings that collapsed on the grid have no winding and are left out
+            if area == 0:
+                return False
+            if area * winding < 0:
+                coords = coords[::-1]
+        elif len(coords) < 2:
+            return False
+        deltas = np.diff(np.vstack((cursor, coords)), axis=0)
+        params = _zigzag(deltas).ravel().tolist()
+        commands.append(_command(CMD_MOVE_TO, 1))
+        commands.extend(params[:2])
+        commands.append(_command(CMD_LINE_TO, len(coords) - 1))
+        commands.extend(params[2:])
+        if close:
+            commands.append(_command(CMD_CLOSE_PATH, 1))
+        cursor = coords[-1]
+        return True
+
+    type_id = shapely.get_type_id(geom)
+    parts = shapely.get_parts(geom)
+    if type_id in (0, 4):
+        coords = shapely.get_coordinates(parts).astype(np.int64)
+        if not len(coords):
+            return None
+        deltas = np.diff(np.vstack((cursor, coords)), axis=0)
+        return GEOM_POINT, [_command(CMD_MOVE_TO, len(coords))] + _zigzag(deltas).ravel().tolist()
+    if type_id in (1, 5):
+        for part in parts:
+            line(shapely.get_coordinates(part), close=False)
+        return (GEOM_LINESTRING, commands) if commands else None
+    if type_id in (3, 6):
+        for polygon in parts:
+            rings = [shapely.get_coordinates(r) for r in shapely.get_rings(polygon)]
+            if not line(rings[0], close=True, winding=1):
+                continue
+            for hole in rings[1:]:
+                line(hole, close=True, winding=-1)
+        return (GEOM_POLYGON, commands) if commands else None
+    if type_id == 7:
+        # Clipping can return a collection; keep its parts of the highest dimension
+        parts = [p for p in parts if not shapely.is_empty(p)]
+        if not parts:
+            return None
+        dim = max(shapely.get_dimensions(parts))
+        return _encode_geometry(shapely.union_all([p for p in parts if shapely.get_dimensions(p) == dim]))
+    return None
+
+
+def encode_layer(name, features):
+    """Protobuf bytes of one layer; features are (id, properties dict, tile-coordinate geometry)."""
+    keys, values = {}, {}
+    encoded = []
+    for fid, properties, geom in features:
+        result = _encode_geometry(geom)
+        if result is None:
+            continue
+        geom_type, commands = result
+        tags = []
+        for key, value in properties.items():
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value).__name__, value), len(values)))
+        feature = b''
+        if fid is not None:
+            feature += _varint_field(1, fid)
+        if tags:
+            feature += _field(2, _packed(tags))
+        feature += _varint_field(3, geom_type) + _field(4, _packed(commands))
+        encoded.append(_field(2, feature))
+    if not encoded:
+        return b''
+    layer = _field(1, name.encode('utf-8')) + b''.join(encoded)
+    layer += b''.join(_field(3, key.encode('utf-8')) for key in keys)
+    layer += b''.join(_field(4, _encode_value(value)) for _, value in values)
+    layer += _varint_field(5, EXTENT) + _varint_field(15, 2)
+    return _field(3, layer)
+
+
+# ---------------------------------------------------------------------------
+# Layers and tiling
+# ---------------------------------------------------------------------------
+
+def load_layer(spec):
+    """GeoDataFrame of a layer in Web Mercator with its property columns."""
+    if spec['source'] == 'territories':
+        import unified_territory_converter as converter
+        gdf = converter.merge_geospatial_data(
+            converter.convert_to_wgs84(converter.read_israel_data(), "Israel"),
+            converter.convert_to_wgs84(converter.read_palestine_data(), "Palestine"))
+    else:
+        from layer_reader import read_layer
+        # Only the property columns are read from the source
+        gdf = read_layer(PROJECT_ROOT / spec['source'], columns=spec['properties'])
+    if gdf.crs is None:
+        gdf = gdf.set_crs('EPSG:4326')
+    gdf = gdf[~(gdf.geometry.isna() | gdf.geometry.is_empty)].to_crs(epsg=3857)
+    columns = spec['properties']
+    columns = [c for c in gdf.columns if c != gdf.geometry.name] if columns is None else \
+        [c for c in columns if c in gdf.columns]
+    return gdf[columns + [gdf.geometry.name]].reset_index(drop=True)
+
+
+def _feature_properties(gdf):
+    """Property dicts without missing values, as plain Python scalars."""
+    import pandas as pd
+
+    columns = [c for c in gdf.columns if c != gdf.geometry.name]
+    records = [dict() for _ in range(len(gdf))]
+    for col in columns:
+        series = gdf[col]
+        missing = series.isna().to_numpy()
+        for record, value, miss in zip(records, series.tolist(), missing):
+            if not miss:
+                record[col] = value if isinstance(value, (str, bool, int, float)) else str(value)
+    return records
+
+
+def tile_bounds(z, x, y):
+    """Web Mercator bounds (minx, miny, maxx, maxy) of an XYZ tile."""
+    size = 2 * ORIGIN / (1 << z)
+    return (-ORIGIN + x * size, ORIGIN - (y + 1) * size, -ORIGIN + (x + 1) * size, ORIGIN - y * size)
+
+
+def tiles_for_bounds(bounds, z):
+    """Tile index ranges (x0, x1, y0, y1), inclusive, covered by each row of bounds."""
+    size = 2 * ORIGIN / (1 << z)
+    last = (1 << z) - 1
+    x0 = np.clip(np.floor((bounds[:, 0] + ORIGIN) / size), 0, last).astype(np.int64)
+    x1 = np.clip(np.floor((bounds[:, 2] + ORIGIN) / size), 0, last).astype(np.int64)
+    y0 = np.clip(np.floor((ORIGIN - bounds[:, 3]) / size), 0, last).astype(np.int64)
+    y1 = np.clip(np.floor((ORIGIN - bounds[:, 1]) / size), 0, last).astype(np.int64)
+    return x0, x1, y0, y1
+
+
+def layer_tiles(gdf, z):
+    """Yield ((x, y), features) for every tile of zoom z the layer has content in."""
+    size = 2 * ORIGIN / (1 << z)
+    unit = size / EXTENT
+    geoms = shapely.simplify(gdf.geometry.to_numpy(), SIMPLIFY_UNITS * unit, preserve_topology=True)
+    properties = _feature_properties(gdf)
+    x0, x1, y0, y1 = tiles_for_bounds(shapely.bounds(geoms), z)
+
+    members = defaultdict(list)
+    for i in range(len(geoms)):
+        for x in range(x0[i], x1[i] + 1):
+            for y in range(y0[i], y1[i] + 1):
+                members[(x, y)].append(i)
+
+    buffer = BUFFER * unit
+    for (x, y), rows in sorted(members.items()):
+        minx, miny, maxx, maxy = tile_bounds(z, x, y)
+        clipped = shapely.clip_by_rect(geoms[rows], minx - buffer, miny - buffer, maxx + buffer, maxy + buffer)
+
+        def to_tile(coords, minx=minx, maxy=maxy):
+            return np.round(np.column_stack(((coords[:, 0] - minx) / unit, (maxy - coords[:, 1]) / unit)))
+
+        in_tile = shapely.transform(clipped, to_tile)
+        features = [(row, properties[row], geom) for row, geom in zip(rows, in_tile)
+                    if not shapely.is_empty(geom)]
+        if features:
+            yield (x, y), features
+
+
+def zoom_range(spec, minzoom=None, maxzoom=None):
+    """Zoom levels of a layer within the optional overall limits."""
+    lo = spec['minzoom'] if minzoom is None else max(spec['minzoom'], minzoom)
+    hi = spec['maxzoom'] if maxzoom is None else min(spec['maxzoom'], maxzoom)
+    return range(lo, hi + 1)
+
+
+def build_pyramid(layers, frames, minzoom=None, maxzoom=None):
+    """Yield (z, x, y, tile bytes) for the loaded layer frames over their zoom ranges."""
+    zooms = sorted({z for spec in layers.values() for z in zoom_range(spec, minzoom, maxzoom)})
+    for z in zooms:
+        tiles = defaultdict(bytes)
+        for name, spec in layers.items():
+            if z not in zoom_range(spec, minzoom, maxzoom):
+                continue
+            for (x, y), features in layer_tiles(frames[name], z):
+                tiles[(x, y)] += encode_layer(name, features)
+        for (x, y), data in sorted(tiles.items()):
+            if data:
+                yield z, x, y, data
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+
+def _field_type(series):
+    import pandas as pd
+
+    if pd.api.types.is_bool_dtype(series):
+        return 'Boolean'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'Number'
+    return 'String'
+
+
+def tilejson(layers, frames, zooms, bounds, minzoom=None, maxzoom=None):
+    lon0, lat0 = _to_lonlat(bounds[0], bounds[1])
+    lon1, lat1 = _to_lonlat(bounds[2], bounds[3])
+    return {
+        'tilejson': '3.0.0',
+        'format': 'pbf',
+        'minzoom': min(zooms),
+        'maxzoom': max(zooms),
+        'bounds': [lon0, lat0, lon1, lat1],
+        'center': [(lon0 + lon1) / 2, (lat0 + lat1) / 2, min(zooms)],
+        'vector_layers': [{
+            'id': name,
+            'fields': {col: _field_type(frames[name][col])
+                       for col in frames[name].columns if col != frames[name].geometry.name},
+            'minzoom': zoom_range(spec, minzoom, maxzoom).start,
+            'maxzoom': zoom_range(spec, minzoom, maxzoom).stop - 1,
+        } for name, spec in layers.items()],
+    }
+
+
+def _to_lonlat(x, y):
+    return math.degrees(x / 6378137.0), math.degrees(2 * math.atan(math.exp(y / 6378137.0)) - math.pi / 2)
+
+
+class DirectoryWriter:
+    """{z}/{x}/{y}.pbf files (uncompressed) and metadata.json."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        # Tiles of a previous run would otherwise outlive features that moved or were removed
+        for old in self.path.glob('*/*/*.pbf'):
+            old.unlink()
+
+    def write(self, z, x, y, data):
+        tile_dir = self.path / str(z) / str(x)
+        tile_dir.mkdir(parents=True, exist_ok=True)
+        (tile_dir / f'{y}.pbf').write_bytes(data)
+
+    def close(self, metadata):
+        with open(self.path / 'metadata.json', 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2)
+
+
+class MBTilesWriter:
+    """MBTiles 1.3: gzipped tiles with TMS row numbering."""
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE metadata (name TEXT, value TEXT);
+            CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+            CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+        """)
+
+    def write(self, z, x, y, data):
+        self.db.execute('INSERT INTO tiles VALUES (?, ?, ?, ?)',
+                        (z, x, (1 << z) - 1 - y, gzip.compress(data)))
+
+    def close(self, metadata):
+        rows = [('name', 'map'), ('format', 'pbf'),
+                ('minzoom', str(metadata['minzoom'])), ('maxzoom', str(metadata['maxzoom'])),
+                ('bounds', ','.join(str(v) for v in metadata['bounds'])),
+                ('center', ','.join(str(v) for v in metadata['center'])),
+                ('json', json.dumps({'vector_layers': metadata['vector_layers']}))]
+        self.db.executemany('INSERT INTO metadata VALUES (?, ?)', rows)
+        self.db.commit()
+        self.db.close()
+
+
+def has_pyramid(output):
+    """Whether output already holds tiles from a previous run."""
+    path = Path(output)
+    if str(output).endswith('.mbtiles'):
+        return path.exists()
+    return (path / 'metadata.json').exists() or any(path.glob('*/*/*.pbf'))
+
+
+def write_pyramid(layers, output, minzoom=None, maxzoom=None):
+    """Tile the layers into output; return {zoom: (tiles, bytes)}."""
+    frames = {name: load_layer(spec) for name, spec in layers.items()}
+    writer = MBTilesWriter(output) if str(output).endswith('.mbtiles') else DirectoryWriter(output)
+    stats = defaultdict(lambda: [0, 0])
+    for z, x, y, data in build_pyramid(layers, frames, minzoom, maxzoom):
+        writer.write(z, x, y, data)
+        stats[z][0] += 1
+        stats[z][1] += len(data)
+    if not stats:
+        raise SystemExit("No tiles were produced for the selected layers and zoom levels")
+    extents = np.array([frame.total_bounds for frame in frames.values()])
+    bounds = np.r_[extents[:, :2].min(axis=0), extents[:, 2:].max(axis=0)]
+    writer.close(tilejson(layers, frames, list(stats), bounds, minzoom, maxzoom))
+    return dict(stats)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Write a Mapbox Vector Tile pyramid of the map layers.")
+    parser.add_argument('--output', default=str(OUTPUT_PATH),
+                        help="Output directory, or a .mbtiles file (default: public/tiles)")
+    parser.add_argument('--layers', nargs='+', choices=list(LAYERS), default=list(LAYERS),
+                        help="Layers to tile (default: all)")
+    parser.add_argument('--minzoom', type=int, help="Lowest zoom to write (default: per layer)")
+    parser.add_argument('--maxzoom', type=int, help="Highest zoom to write (default: per layer)")
+    parser.add_argument('--clean', action='store_true',
+                        help="Let a run limited by --layers/--minzoom/--maxzoom replace an existing pyramid")
+    return parser.parse_args()
+
+
+def main():
+    start = time.perf_counter()
+    args = parse_args()
+    layers = {name: LAYERS[name] for name in args.layers}
+    partial = len(layers) < len(LAYERS) or args.minzoom is not None or args.maxzoom is not None
+    if partial and not args.clean and has_pyramid(args.output):
+        raise SystemExit(f"{args.output} already holds a tile pyramid. Tiles hold all layers, so this "
+                         f"run would replace it with only the selected layers and zoom levels; "
+                         f"pass --clean to do that, or choose another --output.")
+    print(f"Tiling {', '.join(layers)} into {args.output}...")
+    stats = write_pyramid(layers, args.output, args.minzoom, args.maxzoom)
+    for z, (count, size) in sorted(stats.items()):
+        print(f"  z{z:<2} {count:>6} tiles {size / 1024:>9.1f} KB")
+    total = sum(count for count, _ in stats.values())
+    print(f"✓ {total} tiles written in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()